@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+from incidents import iter_incident_log
+from normalize import CATEGORIES
+from schools import sanction_for
+
+# Outstanding sanctions: one row per learner and category whose count passes the
+# school's threshold and that still has unresolved incidents
+def compute_sanctions(incident_log, school):
+    return sanctions_from_counts(count_incidents(incident_log, keys=['learner_category', 'learner_category_open']), school)
+
+def sanctions_from_counts(counts, school):
+    columns = ['Learner', 'Category', 'Count', 'Sanction']
+    tally = counts['learner_category']
+    open_counts = counts['learner_category_open'].reindex(tally.index, fill_value=0)
+    sanctions = []
+    for (learner, cat), count, still_open in zip(tally.index, tally, open_counts):
+        if cat not in CATEGORIES or count == 0 or still_open == 0:
+            continue
+        sanction = sanction_for(school, cat, int(count))
+        if sanction is not None:
+            sanctions.append({
+                'Learner': learner,
+                'Category': cat,
+                'Count': int(count),
+                'Sanction': sanction
+            })
+    return pd.DataFrame(sanctions, columns=columns)
+
+# Boolean array of the rows matching every given filter; None means "Alle"
+def incident_mask(incident_log, learner=None, class_=None, teacher=None, incident=None, category=None,
+                  start_date=None, end_date=None):
+    mask = np.ones(len(incident_log), dtype=bool)
+    for column, value in (('Learner_Full_Name', learner), ('Class', class_), ('Teacher', teacher),
+                          ('Incident', incident), ('Category', category)):
+        if value is not None:
+            mask &= (incident_log[column] == value).to_numpy()
+    if start_date is not None:
+        mask &= (incident_log['Date'] >= start_date).to_numpy()
+    if end_date is not None:
+        mask &= (incident_log['Date'] <= end_date).to_numpy()
+    return mask
+
+# Incidents matching every given filter; None means "Alle"
+def filter_incidents(incident_log, *args, **filters):
+    return incident_log[incident_mask(incident_log, *args, **filters)]
+
+# Counts that every summary, chart and sanction is built from. They only add up, so
+# counts of separate chunks of the log can be merged into the counts of the whole log.
+COUNT_KEYS = ['week', 'month', 'quarter', 'category', 'teacher', 'class', 'incident', 'learner',
+              'learner_category', 'learner_category_open']
+
+# Columns the counts need; streaming reads skip the rest (notably Comment)
+COUNT_COLUMNS = ['Learner_Full_Name', 'Class', 'Teacher', 'Incident', 'Category', 'Date', 'Sanction_Resolved']
+
+PERIOD_KEYS = ['week', 'month', 'quarter']
+
+# Counts behind the report charts
+CHART_KEYS = ['category', 'incident', 'teacher', 'class']
+
+# Roll counts per (day, category) up into counts per week/month/quarter and category
+def period_counts(daily, keys=PERIOD_KEYS):
+    days = pd.DatetimeIndex(daily.index.get_level_values('Date'))
+    categories = daily.index.get_level_values('Category')
+    labels = {
+        # Weeks end on (and are labelled with) a Monday, like pd.Grouper(freq='W-MON')
+        'week': lambda: days + pd.to_timedelta((-days.weekday) % 7, unit='D'),
+        'month': lambda: days.to_period('M'),
+        'quarter': lambda: days.to_period('Q')
+    }
+    counts = {}
+    for key in keys:
+        periods = pd.Index(labels[key](), name='Date')
+        counts[key] = daily.groupby([periods, categories]).sum().astype('int64')
+    return counts
+
+# Incidents per (day, category); rows without a valid date are left out
+def daily_counts(incident_log):
+    dates = pd.to_datetime(incident_log['Date'], errors='coerce')
+    dated = dates.notna()
+    return pd.DataFrame({'Date': dates[dated], 'Category': incident_log['Category'][dated]}).groupby(
+        ['Date', 'Category']).size()
+
+# Count incidents per period/category, per category, teacher, class, incident and learner,
+# and per learner/category (all and unresolved)
+def count_incidents(incident_log, keys=COUNT_KEYS):
+    counts = {}
+    periods = [key for key in PERIOD_KEYS if key in keys]
+    if periods:
+        counts.update(period_counts(daily_counts(incident_log), periods))
+    for key, column in (('category', 'Category'), ('teacher', 'Teacher'), ('class', 'Class'),
+                        ('incident', 'Incident'), ('learner', 'Learner_Full_Name')):
+        if key in keys:
+            counts[key] = incident_log[column].value_counts().sort_index()
+    if 'learner_category' in keys:
+        counts['learner_category'] = incident_log.groupby(['Learner_Full_Name', 'Category'])['Incident'].count()
+    if 'learner_category_open' in keys:
+        counts['learner_category_open'] = (~incident_log['Sanction_Resolved'].astype(bool)).groupby(
+            [incident_log['Learner_Full_Name'], incident_log['Category']]).sum()
+    return counts
+
+# Add two sets of counts together
+def merge_counts(left, right):
+    if left is None:
+        return right
+    return {key: left[key].add(right[key], fill_value=0).astype('int64').sort_index() for key in left}
+
+# Fold the log into counts chunk by chunk, so memory stays bounded by the number of
+# distinct periods, teachers, classes and learners rather than by the number of incidents
+def stream_counts(path, chunksize=50000, keys=COUNT_KEYS, **filters):
+    counts = None
+    for chunk in iter_incident_log(path, chunksize=chunksize, columns=COUNT_COLUMNS):
+        if filters:
+            chunk = filter_incidents(chunk, **filters)
+        counts = merge_counts(counts, count_incidents(chunk, keys=keys))
+    return counts if counts is not None else count_incidents(pd.DataFrame(columns=COUNT_COLUMNS), keys=keys)
+
+# The `n` largest counts, ties broken by name so every path ranks them the same way
+def top_counts(counts, n):
+    return counts.sort_index().sort_values(ascending=False, kind='stable').head(n)
+
+# Learners with more than `more_than` incidents
+def high_risk_learners(counts, more_than=2):
+    learner_counts = counts['learner']
+    return learner_counts[learner_counts > more_than].index
+
+def _period_table(counts):
+    summary = counts.unstack(fill_value=0).sort_index()
+    summary.index.name = 'Date'
+    summary.columns.name = 'Category'
+    return summary
+
+# Incidents per category for each week ending on a Monday, with a total column
+def weekly_summary_from_counts(counts):
+    summary = _period_table(counts['week'])
+    summary.index = summary.index.strftime('%Y-%m-%d')
+    summary['Totaal'] = summary.sum(axis=1)
+    return summary.reset_index().rename(columns={'Date': 'Week Begin (Maandag)'})
+
+# Incidents per category for each month
+def monthly_summary_from_counts(counts):
+    summary = _period_table(counts['month'])
+    summary.index = summary.index.strftime('%Y-%m')
+    summary.index.name = 'Date'
+    return summary
+
+# Incidents per category for each quarter
+def quarterly_summary_from_counts(counts):
+    summary = _period_table(counts['quarter'])
+    summary.index = [f"{period.year}-Q{period.quarter}" for period in summary.index]
+    summary.index.name = 'Date'
+    return summary
+
+def weekly_summary(incident_log):
+    return weekly_summary_from_counts(count_incidents(incident_log, keys=['week']))
+
+def monthly_summary(incident_log):
+    return monthly_summary_from_counts(count_incidents(incident_log, keys=['month']))
+
+def quarterly_summary(incident_log):
+    return quarterly_summary_from_counts(count_incidents(incident_log, keys=['quarter']))
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+import pandas as pd
+
+# Manifest key of the full-log report
+FULL_LOG_KEY = 'volledig'
+
+# Artifacts are stored per school as <artifact_dir>/<school>/<sha256>.<extension>,
+# with one small index file per report key and format pointing at the current blob
+def school_artifact_dir(school):
+    return os.path.join(school['artifact_dir'], school['key'])
+
+def blob_path(school, sha256, extension='docx'):
+    return os.path.join(school_artifact_dir(school), f"{sha256}.{extension}")
+
+def index_path(school, key, extension='docx'):
+    if extension != 'docx':
+        key = f"{key}.{extension}"
+    name = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return os.path.join(school_artifact_dir(school), "index", f"{name}.json")
+
+# Manifest key for a school-wide or learner report over one period
+def artifact_key(period, start_date, end_date, learner=None):
+    key = f"{period}/{start_date.strftime('%Y-%m-%d')}_{end_date.strftime('%Y-%m-%d')}"
+    return f"{key}/leerder/{learner}" if learner else f"{key}/skool"
+
+# Digest of the rows a report is built from; an artifact is reused while this is unchanged
+def inputs_digest(df):
+    hashed = pd.util.hash_pandas_object(df.astype(str), index=False)
+    return hashlib.sha256(hashed.values.tobytes()).hexdigest()
+
+# Blobs younger than this are kept by prune_artifacts even when no index entry points at
+# them, so a blob stored a moment ago is not deleted before its entry is written
+PRUNE_GRACE_SECONDS = 3600
+
+# Write through a temporary file of its own, so threads storing the same blob don't collide
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+# Path of the stored artifact for a key if it was rendered from the same inputs, else None
+def find_artifact(school, key, digest, extension='docx'):
+    try:
+        with open(index_path(school, key, extension), encoding="utf-8") as f:
+            entry = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if entry['inputs'] != digest:
+        return None
+    path = blob_path(school, entry['sha256'], extension)
+    return path if os.path.exists(path) else None
+
+# Store rendered bytes under their content hash and point the key at them
+def store_artifact(school, key, digest, data, extension='docx'):
+    sha256 = hashlib.sha256(data).hexdigest()
+    path = blob_path(school, sha256, extension)
+    if not os.path.exists(path):
+        _write_atomic(path, data)
+    entry = {'key': key, 'sha256': sha256, 'inputs': digest, 'rendered': datetime.now().isoformat(timespec='seconds')}
+    _write_atomic(index_path(school, key, extension), json.dumps(entry).encode("utf-8"))
+    return path
+
+# Delete the blobs of a school that no index entry points at any more and return how
+# many were deleted. Every change to the log stores a new full-log report, so without
+# this the store grows by one report per change.
+def prune_artifacts(school):
+    directory = school_artifact_dir(school)
+    index_dir = os.path.join(directory, "index")
+    referenced = set()
+    if os.path.isdir(index_dir):
+        for name in os.listdir(index_dir):
+            try:
+                with open(os.path.join(index_dir, name), encoding="utf-8") as f:
+                    referenced.add(json.load(f)['sha256'])
+            except (FileNotFoundError, json.JSONDecodeError, KeyError):
+                continue
+    if not os.path.isdir(directory):
+        return 0
+    cutoff = time.time() - PRUNE_GRACE_SECONDS
+    pruned = 0
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.split(".")[0] in referenced or not os.path.isfile(path):
+            continue
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                pruned += 1
+        except FileNotFoundError:
+            continue
+    return pruned
+
+# Return (path, rendered) for a report, rendering and storing it only when missing or stale
+def get_or_render(school, key, df, render, extension='docx'):
+    digest = inputs_digest(df)
+    path = find_artifact(school, key, digest, extension)
+    if path is not None:
+        return path, False
+    return store_artifact(school, key, digest, render().getvalue(), extension), True
@@ -0,0 +1,128 @@
+import io
+import multiprocessing
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.ticker import MaxNLocator
+import pandas as pd
+import seaborn as sns
+
+# Report charts are drawn in a small pool of worker processes that keep matplotlib and
+# seaborn imported between reports. A chart is described by a plain dict (a spec), so
+# it pickles cheaply; the worker sends back PNG bytes. The five charts of a report are
+# drawn side by side, so a report waits for its slowest chart rather than for all five.
+
+# Set seaborn style for lightweight charts
+sns.set_style("whitegrid")
+plt.rcParams['font.size'] = 8
+plt.rcParams['axes.titlesize'] = 10
+plt.rcParams['axes.labelsize'] = 8
+plt.rcParams['xtick.labelsize'] = 7
+plt.rcParams['ytick.labelsize'] = 7
+
+# Worker processes; 0 draws the charts in the calling process instead
+CHART_WORKERS = int(os.environ.get("INSIDENT_CHART_WORKERS", str(min(5, os.cpu_count() or 1))))
+
+# Spec for a bar chart of `counts` (a Series indexed by label)
+def bar_chart(counts, title, xlabel, rotation=0):
+    return {'kind': 'bar', 'title': title, 'xlabel': xlabel, 'labels': list(counts.index),
+            'values': [int(value) for value in counts.values], 'rotation': rotation}
+
+# Spec for a pie chart of `counts`
+def pie_chart(counts, title):
+    return {'kind': 'pie', 'title': title, 'name': counts.name, 'labels': list(counts.index),
+            'values': [int(value) for value in counts.values]}
+
+# Draw one chart spec and return it as PNG bytes
+def render_chart(spec):
+    fig = Figure(figsize=(3, 2))
+    ax = fig.subplots()
+    if spec['kind'] == 'bar':
+        sns.barplot(x=spec['labels'], y=spec['values'], ax=ax, palette='Blues')
+        ax.set_xlabel(spec['xlabel'], fontsize=8)
+        ax.set_ylabel('Aantal', fontsize=8)
+        ax.yaxis.set_major_locator(MaxNLocator(integer=True))
+        if spec['rotation']:
+            ax.tick_params(axis='x', rotation=spec['rotation'], labelsize=7)
+        else:
+            ax.tick_params(axis='both', labelsize=7)
+    else:
+        counts = pd.Series(spec['values'], index=spec['labels'], name=spec['name'])
+        counts.plot(kind='pie', ax=ax, autopct='%1.1f%%', colors=sns.color_palette('Blues'), textprops={'fontsize': 7})
+    ax.set_title(spec['title'], fontsize=10)
+    fig.tight_layout()
+    img_stream = io.BytesIO()
+    fig.savefig(img_stream, format='png', dpi=80, bbox_inches='tight')
+    return img_stream.getvalue()
+
+# Runs once in each worker: draw a throw-away chart so the first real one is not
+# also paying for font loading and the rest of matplotlib's lazy setup. Then wait
+# until every worker has started, so no worker takes a second task before the pool
+# has launched them all (see get_chart_pool).
+def _warm_worker(started):
+    render_chart({'kind': 'bar', 'title': '', 'xlabel': '', 'labels': ['1'], 'values': [1], 'rotation': 0})
+    try:
+        started.wait(60)
+    except threading.BrokenBarrierError:
+        pass
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# A new worker sets itself up like the parent's __main__ module, and under Streamlit that
+# is the app script, which would run again in every worker (starting another pool while
+# still bootstrapping). So while the workers are launched, __main__ is this module and
+# they import charts instead. Streamlit sets __main__ itself when a session's script
+# starts; that assignment is kept if it happened meanwhile.
+@contextmanager
+def _charts_as_main():
+    main = sys.modules['__main__']
+    sys.modules['__main__'] = sys.modules[__name__]
+    try:
+        yield
+    finally:
+        if sys.modules['__main__'] is sys.modules[__name__]:
+            sys.modules['__main__'] = main
+
+# The process-wide chart pool, started on first use, or None when CHART_WORKERS is 0.
+# Workers come from a fork server (spawn where there is none) rather than forking the
+# multi-threaded Streamlit process.
+def get_chart_pool():
+    global _pool
+    if CHART_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            if 'forkserver' in methods:
+                context.set_forkserver_preload(['charts'])
+            _pool = ProcessPoolExecutor(max_workers=CHART_WORKERS, mp_context=context, initializer=_warm_worker,
+                                        initargs=(context.Barrier(CHART_WORKERS),))
+            # The pool starts a worker per task submitted while none is idle, and none is
+            # idle before all have passed the barrier: this launches every worker now
+            with _charts_as_main():
+                for _ in range(CHART_WORKERS):
+                    _pool.submit(int)
+        return _pool
+
+# Draw chart specs in the pool, in parallel, returning PNG bytes in the same order.
+# Falls back to drawing them here if the pool is disabled or a worker died.
+def render_charts(specs):
+    global _pool
+    pool = get_chart_pool()
+    if pool is not None:
+        try:
+            return list(pool.map(render_chart, specs))
+        except BrokenProcessPool:
+            with _pool_lock:
+                if _pool is pool:
+                    _pool = None
+    return [render_chart(spec) for spec in specs]
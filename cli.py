@@ -0,0 +1,209 @@
+import argparse
+import sys
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from analytics import (compute_sanctions, count_incidents, filter_incidents, high_risk_learners, incident_mask,
+                       monthly_summary, monthly_summary_from_counts, quarterly_summary, quarterly_summary_from_counts,
+                       sanctions_from_counts, stream_counts, top_counts, weekly_summary, weekly_summary_from_counts)
+from exports import EXPORT_FORMATS, take_blocks
+from incidents import compact_incident_log, iter_incident_log, read_events, read_incident_log, undo_last_event
+from reports import REPORT_FORMATS
+from schools import load_schools
+
+SUMMARIES = {
+    'weekliks': weekly_summary,
+    'maandeliks': monthly_summary,
+    'kwartaalliks': quarterly_summary
+}
+
+SUMMARIES_FROM_COUNTS = {
+    'weekliks': ('week', weekly_summary_from_counts),
+    'maandeliks': ('month', monthly_summary_from_counts),
+    'kwartaalliks': ('quarter', quarterly_summary_from_counts)
+}
+
+COUNT_LABELS = [
+    ('category', 'Kategorie'),
+    ('incident', 'Insident'),
+    ('teacher', 'Onderwyser'),
+    ('class', 'Klas')
+]
+
+def _date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+def _school(args, parser):
+    schools = load_schools()
+    key = args.skool or (next(iter(schools)) if len(schools) == 1 else None)
+    if key not in schools:
+        parser.error(f"Kies 'n skool met --skool ({', '.join(schools)})")
+    return schools[key]
+
+# Write a frame as CSV to --uit, or print it as a table
+def _output(df, path, index=False):
+    if path:
+        df.to_csv(path, index=index)
+        print(f"{len(df)} rye geskryf na {path}")
+    else:
+        print(df.to_string(index=index) if not df.empty else "Geen rye nie.")
+
+def cmd_report(args, parser):
+    if args.stroom:
+        # The report lists every matching incident, so it needs them in memory anyway
+        parser.error("--stroom werk nie met verslag nie: die verslag bevat al die insidente")
+    incident_log = read_incident_log(_school(args, parser)['incident_log'])
+    df = filter_incidents(incident_log, learner=args.leerder, class_=args.klas, start_date=args.van, end_date=args.tot)
+    if df.empty:
+        print("Geen insidente vir hierdie keuse nie.", file=sys.stderr)
+        return 1
+    report_format = REPORT_FORMATS[args.formaat]
+    path = args.uit or f"insident_verslag.{report_format['extension']}"
+    if args.leerder:
+        start_date = args.van or df['Date'].min()
+        end_date = args.tot or df['Date'].max()
+        stream = report_format['learner'](df, args.leerder, 'Pasgemaak', start_date, end_date)
+    else:
+        stream = report_format['full'](df)
+    with open(path, "wb") as f:
+        f.write(stream.getvalue())
+    print(f"Verslag met {len(df)} insidente geskryf na {path}")
+    return 0
+
+def cmd_sanctions(args, parser):
+    school = _school(args, parser)
+    if args.stroom:
+        counts = stream_counts(school['incident_log'], args.stukgrootte, keys=['learner_category', 'learner_category_open'])
+        _output(sanctions_from_counts(counts, school), args.uit)
+    else:
+        _output(compute_sanctions(read_incident_log(school['incident_log']), school), args.uit)
+    return 0
+
+def cmd_summary(args, parser):
+    if args.stroom:
+        key, from_counts = SUMMARIES_FROM_COUNTS[args.tydperk]
+        counts = stream_counts(_school(args, parser)['incident_log'], args.stukgrootte, keys=[key],
+                               class_=args.klas, start_date=args.van, end_date=args.tot)
+        _output(from_counts(counts), args.uit, index=args.tydperk != 'weekliks')
+        return 0
+    incident_log = read_incident_log(_school(args, parser)['incident_log'])
+    incident_log = filter_incidents(incident_log, class_=args.klas, start_date=args.van, end_date=args.tot)
+    if incident_log.empty:
+        _output(incident_log, args.uit)
+        return 0
+    summary = SUMMARIES[args.tydperk](incident_log)
+    _output(summary, args.uit, index=args.tydperk != 'weekliks')
+    return 0
+
+# Incidents per category, type, teacher and class, and learners with more than two incidents
+def cmd_counts(args, parser):
+    keys = [key for key, _ in COUNT_LABELS] + ['learner']
+    filters = dict(class_=args.klas, start_date=args.van, end_date=args.tot)
+    if args.stroom:
+        counts = stream_counts(_school(args, parser)['incident_log'], args.stukgrootte, keys=keys, **filters)
+    else:
+        incident_log = read_incident_log(_school(args, parser)['incident_log'])
+        counts = count_incidents(filter_incidents(incident_log, **filters), keys=keys)
+    tables = [pd.DataFrame({'Groep': label, 'Waarde': counts[key].index, 'Aantal': counts[key].values})
+              for key, label in COUNT_LABELS]
+    learners = top_counts(counts['learner'], len(counts['learner']))
+    learners = learners[learners.index.isin(high_risk_learners(counts))]
+    tables.append(pd.DataFrame({'Groep': 'Herhalende Leerder', 'Waarde': learners.index, 'Aantal': learners.values}))
+    _output(pd.concat(tables, ignore_index=True), args.uit)
+    return 0
+
+# Export the matching incidents as CSV or XLSX, block by block; with --stroom the log
+# itself is read in chunks too, so neither the log nor the result is held whole
+def cmd_export(args, parser):
+    path = _school(args, parser)['incident_log']
+    filters = dict(learner=args.leerder, class_=args.klas, teacher=args.onderwyser, category=args.kategorie,
+                   start_date=args.van, end_date=args.tot)
+    if args.stroom:
+        blocks = (filter_incidents(chunk, **filters) for chunk in iter_incident_log(path, args.stukgrootte))
+    else:
+        incident_log = read_incident_log(path)
+        blocks = take_blocks(incident_log, np.flatnonzero(incident_mask(incident_log, **filters)))
+    export_format = EXPORT_FORMATS[args.formaat]
+    out_path = args.uit or f"gefiltreerde_insidente.{export_format['extension']}"
+    with open(out_path, "wb") as out:
+        rows = export_format['write'](blocks, out)
+    print(f"{rows} insidente geskryf na {out_path}")
+    return 0
+
+# Fold the event stream into a new snapshot of the log
+def cmd_compact(args, parser):
+    path = _school(args, parser)['incident_log']
+    count = len(read_events(path))
+    if compact_incident_log(path):
+        print(f"{count} veranderinge in die log ingevou")
+    else:
+        print("Geen veranderinge om in te vou nie.")
+    return 0
+
+# Undo the latest save, resolve or delete
+def cmd_undo(args, parser):
+    event = undo_last_event(_school(args, parser)['incident_log'])
+    if event is None:
+        print("Niks om te ontdoen nie.")
+        return 1
+    print(f"Ontdoen: {event['event']} van {event['at']}")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Insident verslae en opsommings sonder die Streamlit-toepassing.")
+    parser.add_argument("--skool", help="Skool sleutel uit schools.json (verstek: die enigste skool)")
+    parser.add_argument("--stroom", action="store_true",
+                        help="Lees die log in stukke in plaas van alles in geheue (vir baie groot logs)")
+    parser.add_argument("--stukgrootte", type=int, default=50000, help="Rye per stuk met --stroom")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    report = commands.add_parser("verslag", help="Genereer 'n Word verslag")
+    report.add_argument("--van", type=_date, help="Eerste datum (JJJJ-MM-DD)")
+    report.add_argument("--tot", type=_date, help="Laaste datum (JJJJ-MM-DD)")
+    report.add_argument("--klas", help="Net hierdie klas")
+    report.add_argument("--leerder", help="Leerder verslag vir hierdie leerder")
+    report.add_argument("--formaat", choices=list(REPORT_FORMATS), default='Word')
+    report.add_argument("--uit", help="Uitvoer lêer (verstek: insident_verslag.docx of .html)")
+    report.set_defaults(func=cmd_report)
+
+    sanctions = commands.add_parser("sanksies", help="Bereken uitstaande sanksies")
+    sanctions.add_argument("--uit", help="Skryf na hierdie CSV lêer")
+    sanctions.set_defaults(func=cmd_sanctions)
+
+    summary = commands.add_parser("opsomming", help="Insidente per kategorie per tydperk")
+    summary.add_argument("--tydperk", choices=list(SUMMARIES), default='weekliks')
+    summary.add_argument("--van", type=_date, help="Eerste datum (JJJJ-MM-DD)")
+    summary.add_argument("--tot", type=_date, help="Laaste datum (JJJJ-MM-DD)")
+    summary.add_argument("--klas", help="Net hierdie klas")
+    summary.add_argument("--uit", help="Skryf na hierdie CSV lêer")
+    summary.set_defaults(func=cmd_summary)
+
+    counts = commands.add_parser("tellings", help="Insidente per kategorie, tipe, onderwyser en klas")
+    counts.add_argument("--van", type=_date, help="Eerste datum (JJJJ-MM-DD)")
+    counts.add_argument("--tot", type=_date, help="Laaste datum (JJJJ-MM-DD)")
+    counts.add_argument("--klas", help="Net hierdie klas")
+    counts.add_argument("--uit", help="Skryf na hierdie CSV lêer")
+    counts.set_defaults(func=cmd_counts)
+
+    export = commands.add_parser("uitvoer", help="Skryf gefiltreerde insidente na CSV of XLSX")
+    export.add_argument("--van", type=_date, help="Eerste datum (JJJJ-MM-DD)")
+    export.add_argument("--tot", type=_date, help="Laaste datum (JJJJ-MM-DD)")
+    export.add_argument("--klas", help="Net hierdie klas")
+    export.add_argument("--onderwyser", help="Net hierdie onderwyser")
+    export.add_argument("--leerder", help="Net hierdie leerder")
+    export.add_argument("--kategorie", choices=['1', '2', '3', '4'], help="Net hierdie kategorie")
+    export.add_argument("--formaat", choices=list(EXPORT_FORMATS), default='CSV')
+    export.add_argument("--uit", help="Uitvoer lêer (verstek: gefiltreerde_insidente.csv of .xlsx)")
+    export.set_defaults(func=cmd_export)
+
+    compact = commands.add_parser("kompakteer", help="Vou die veranderinge in 'n nuwe momentopname van die log in")
+    compact.set_defaults(func=cmd_compact)
+
+    undo = commands.add_parser("ontdoen", help="Ontdoen die laaste verandering aan die log")
+    undo.set_defaults(func=cmd_undo)
+
+    args = parser.parse_args(argv)
+    return args.func(args, parser)
+
+if __name__ == "__main__":
+    sys.exit(main())
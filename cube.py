@@ -0,0 +1,98 @@
+import threading
+from datetime import date
+import pandas as pd
+from analytics import period_counts, top_counts
+
+# Dimensions of the count cube
+CUBE_DIMENSIONS = ['Date', 'Class', 'Teacher', 'Incident', 'Category']
+
+# Cube cell for rows without a valid date; only counted when no date range is asked for
+UNDATED = date.min
+
+# Incident counts per (date, class, teacher, incident, category).
+# The cube has one row per distinct combination, which is far smaller than the log, so
+# panels and charts slice and sum it instead of scanning incidents. Saves and deletes
+# add or subtract their own cells; every update swaps in a new frame, so a slice that
+# is being read never changes underneath the reader.
+class IncidentCube:
+    def __init__(self, incident_log):
+        self._lock = threading.Lock()
+        self._cells = self._count(incident_log.iloc[:0])
+        self._frame = self._cells.reset_index()
+        self.add(incident_log)
+
+    @staticmethod
+    def _count(df):
+        keys = pd.DataFrame({
+            'Date': df['Date'].where(df['Date'].notna(), UNDATED),
+            'Class': df['Class'].fillna('').astype(str),
+            'Teacher': df['Teacher'].fillna('').astype(str),
+            'Incident': df['Incident'].fillna('').astype(str),
+            'Category': df['Category'].astype(str)
+        })
+        return keys.groupby(CUBE_DIMENSIONS).size().rename('Count')
+
+    def _apply(self, df, sign):
+        if df.empty:
+            return
+        delta = self._count(df) * sign
+        with self._lock:
+            cells = self._cells.add(delta, fill_value=0).astype('int64')
+            self._cells = cells[cells > 0].rename('Count')
+            self._frame = self._cells.reset_index()
+
+    # Add newly saved incidents
+    def add(self, df):
+        self._apply(df, 1)
+
+    # Remove deleted incidents
+    def remove(self, df):
+        self._apply(df, -1)
+
+    # Cells matching the filters; None means "Alle"
+    def _slice(self, start_date=None, end_date=None, class_=None, teacher=None, incident=None, category=None):
+        frame = self._frame
+        mask = pd.Series(True, index=frame.index)
+        for column, value in (('Class', class_), ('Teacher', teacher), ('Incident', incident), ('Category', category)):
+            if value is not None:
+                mask &= frame[column] == value
+        if start_date is not None or end_date is not None:
+            mask &= frame['Date'] != UNDATED
+        if start_date is not None:
+            mask &= frame['Date'] >= start_date
+        if end_date is not None:
+            mask &= frame['Date'] <= end_date
+        return frame[mask]
+
+    # Incident counts per value of one dimension (or several), in the same order as
+    # value_counts().sort_index() over the matching incidents
+    def counts(self, by, **filters):
+        cells = self._slice(**filters)
+        counts = cells.groupby(by)['Count'].sum().astype('int64')
+        if isinstance(by, str) and by != 'Date':
+            counts = counts[counts.index != '']
+        counts.name = 'count'
+        return counts
+
+    # Total number of incidents matching the filters
+    def total(self, **filters):
+        return int(self._slice(**filters)['Count'].sum())
+
+    # Counts for the report charts: per category, incident type, teacher and class
+    def chart_counts(self, **filters):
+        return {key: self.counts(column, **filters)
+                for key, column in (('category', 'Category'), ('incident', 'Incident'),
+                                    ('teacher', 'Teacher'), ('class', 'Class'))}
+
+    # Largest counts of one dimension, ties broken by name
+    def top(self, by, n, **filters):
+        return top_counts(self.counts(by, **filters), n)
+
+    # Week/month/quarter by category counts, as analytics.count_incidents gives them
+    def period_counts(self, keys, **filters):
+        daily = self.counts(['Date', 'Category'], **filters)
+        daily = daily[daily.index.get_level_values('Date') != UNDATED]
+        daily.index = pd.MultiIndex.from_arrays(
+            [pd.to_datetime(daily.index.get_level_values('Date')), daily.index.get_level_values('Category')],
+            names=['Date', 'Category'])
+        return period_counts(daily, keys)
@@ -0,0 +1,100 @@
+import tempfile
+import pandas as pd
+
+try:
+    import xlsxwriter
+except ImportError:  # XLSX export is offered only when xlsxwriter is installed
+    xlsxwriter = None
+
+# Exports are written block by block: a block is a small DataFrame of at most
+# EXPORT_BLOCK_ROWS rows, taken from the log by position (see take_blocks) or read from
+# the file in chunks (cli.py uitvoer), so the filtered result is never built whole.
+
+EXPORT_BLOCK_ROWS = 5000
+
+# Exported columns and their headings
+EXPORT_COLUMNS = {
+    'Learner_Full_Name': 'Leerder Naam',
+    'Class': 'Klas',
+    'Teacher': 'Onderwyser',
+    'Incident': 'Insident',
+    'Category': 'Kategorie',
+    'Comment': 'Kommentaar',
+    'Date': 'Datum',
+    'Sanction_Resolved': 'Sanksie Opgelos'
+}
+
+# Blocks of the rows at `positions` of `incident_log` (e.g. np.flatnonzero of a filter mask)
+def take_blocks(incident_log, positions, block_rows=EXPORT_BLOCK_ROWS):
+    for start in range(0, len(positions), block_rows):
+        yield incident_log.take(positions[start:start + block_rows])
+
+def _export_frame(block):
+    return block.reindex(columns=list(EXPORT_COLUMNS)).rename(columns=EXPORT_COLUMNS)
+
+# Text that Excel would read as the start of a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# Prefix such text with ' so Excel shows it as text instead of running it
+def _escape_formulas(frame):
+    for column in frame.columns[frame.dtypes == object]:
+        values = frame[column]
+        formula = values.map(lambda value: isinstance(value, str) and value.startswith(FORMULA_PREFIXES))
+        if formula.any():
+            frame[column] = values.where(~formula, "'" + values.astype(str))
+    return frame
+
+# Write blocks as CSV to a binary file; the BOM makes Excel read the text as UTF-8
+def write_csv(blocks, out):
+    out.write(",".join(EXPORT_COLUMNS.values()).encode("utf-8-sig") + b"\n")
+    rows = 0
+    for block in blocks:
+        frame = _escape_formulas(_export_frame(block))
+        out.write(frame.to_csv(header=False, index=False, lineterminator="\n").encode("utf-8"))
+        rows += len(block)
+    return rows
+
+# Write blocks as an XLSX sheet. xlsxwriter's constant_memory mode flushes every row to
+# disk as soon as the next one starts, so memory stays flat however many rows there are.
+# Text is always written as text: a comment starting with "=" must not become a formula.
+def write_xlsx(blocks, out):
+    workbook = xlsxwriter.Workbook(out, {'constant_memory': True, 'in_memory': False,
+                                         'strings_to_formulas': False, 'strings_to_urls': False})
+    worksheet = workbook.add_worksheet("Insidente")
+    bold = workbook.add_format({'bold': True})
+    date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
+    worksheet.write_row(0, 0, list(EXPORT_COLUMNS.values()), bold)
+    date_column = list(EXPORT_COLUMNS).index('Date')
+    rows = 0
+    for block in blocks:
+        frame = _export_frame(block)
+        values = frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None)
+        for row in values:
+            rows += 1
+            for column, value in enumerate(row):
+                if value is None:
+                    continue
+                if column == date_column:
+                    worksheet.write_datetime(rows, column, pd.Timestamp(value).to_pydatetime(), date_format)
+                else:
+                    worksheet.write(rows, column, value)
+    workbook.close()
+    return rows
+
+# Download formats for filtered incidents
+EXPORT_FORMATS = {
+    'CSV': {'extension': 'csv', 'mime': 'text/csv', 'write': write_csv}
+}
+if xlsxwriter is not None:
+    EXPORT_FORMATS['XLSX'] = {
+        'extension': 'xlsx',
+        'mime': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        'write': write_xlsx
+    }
+
+# Write blocks in `format_name` to a temporary file and return its content
+def export_bytes(blocks, format_name):
+    with tempfile.TemporaryFile() as out:
+        EXPORT_FORMATS[format_name]['write'](blocks, out)
+        out.seek(0)
+        return out.read()
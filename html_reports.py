@@ -0,0 +1,184 @@
+import io
+import math
+from html import escape
+from string import Template
+from analytics import CHART_KEYS, count_incidents, high_risk_learners, top_counts
+
+# Light-weight alternative to the Word reports: one self-contained HTML page with
+# inline SVG charts drawn from the aggregated counts. It opens in any browser and
+# prints cleanly from a phone.
+
+# Seaborn's 'Blues' palette, light to dark
+BLUES = ['#dbe9f6', '#bad6eb', '#89bedc', '#539ecd', '#2b7bba', '#0b559f']
+
+COLUMN_LABELS = [
+    ('Learner_Full_Name', 'Leerder Naam'),
+    ('Class', 'Klas'),
+    ('Teacher', 'Onderwyser'),
+    ('Incident', 'Insident'),
+    ('Category', 'Kategorie'),
+    ('Comment', 'Kommentaar'),
+    ('Date', 'Datum')
+]
+
+PAGE = Template("""<!DOCTYPE html>
+<html lang="af">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>$title</title>
+<style>
+body { font-family: Arial, sans-serif; font-size: 14px; color: #333; margin: 16px; }
+h1 { font-size: 22px; color: #0b559f; }
+h2 { font-size: 17px; color: #0b559f; border-bottom: 1px solid #bad6eb; padding-bottom: 4px; }
+p.meta { margin: 2px 0; }
+.table-wrap { overflow-x: auto; }
+table { border-collapse: collapse; width: 100%; font-size: 12px; }
+th, td { border: 1px solid #999; padding: 4px 6px; text-align: left; vertical-align: top; }
+th { background: #dbe9f6; }
+.charts { display: flex; flex-wrap: wrap; gap: 12px; }
+.charts svg { width: 100%; max-width: 320px; height: auto; }
+svg text { font-family: Arial, sans-serif; fill: #333; }
+@media print {
+  body { margin: 0; font-size: 11px; }
+  .table-wrap { overflow: visible; }
+  tr, svg { page-break-inside: avoid; break-inside: avoid; }
+  thead { display: table-header-group; }
+}
+</style>
+</head>
+<body>
+<h1>$title</h1>
+$body
+</body>
+</html>
+""")
+
+def _incident_table(df):
+    rows = ["<div class=\"table-wrap\"><table><thead><tr>"]
+    rows.extend(f"<th>{label}</th>" for _, label in COLUMN_LABELS)
+    rows.append("</tr></thead><tbody>")
+    columns = [column for column, _ in COLUMN_LABELS]
+    for values in df[columns].itertuples(index=False, name=None):
+        rows.append("<tr>")
+        for column, value in zip(columns, values):
+            text = value.strftime("%Y-%m-%d") if column == 'Date' else str(value)
+            rows.append(f"<td>{escape(text)}</td>")
+        rows.append("</tr>")
+    rows.append("</tbody></table></div>")
+    return "".join(rows)
+
+def _palette(n):
+    if n <= 1:
+        return [BLUES[-2]]
+    return [BLUES[round(i * (len(BLUES) - 1) / (n - 1))] for i in range(n)]
+
+def _label(text, limit=14):
+    text = str(text)
+    return escape(text if len(text) <= limit else text[:limit - 1] + "…")
+
+# Smallest of 1, 2, 5, 10, 20, 50, ... that is at least `raw`
+def _nice_step(raw):
+    magnitude = 1
+    while True:
+        for factor in (1, 2, 5):
+            if factor * magnitude >= raw:
+                return factor * magnitude
+        magnitude *= 10
+
+# Vertical bar chart of a counts Series, with integer gridlines
+def svg_bar_chart(counts, title, xlabel):
+    width, height = 320, 220
+    left, right, top, bottom = 34, 8, 26, 58
+    plot_w, plot_h = width - left - right, height - top - bottom
+    peak = max(int(counts.max()) if len(counts) else 0, 1)
+    step = _nice_step(peak / 5)
+    ymax = step * math.ceil(peak / step)
+    parts = [f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" role="img">',
+             f'<text x="{width / 2}" y="16" font-size="12" text-anchor="middle" font-weight="bold">{escape(title)}</text>']
+    for tick in range(0, ymax + 1, step):
+        y = top + plot_h - plot_h * tick / ymax
+        parts.append(f'<line x1="{left}" x2="{width - right}" y1="{y:.1f}" y2="{y:.1f}" stroke="#ddd"/>'
+                     f'<text x="{left - 4}" y="{y + 3:.1f}" font-size="9" text-anchor="end">{tick}</text>')
+    slot = plot_w / max(len(counts), 1)
+    rotate = len(counts) > 4
+    for i, (label, value, colour) in enumerate(zip(counts.index, counts.values, _palette(len(counts)))):
+        bar_h = plot_h * int(value) / ymax
+        x = left + i * slot + slot * 0.15
+        cx = left + (i + 0.5) * slot
+        parts.append(f'<rect x="{x:.1f}" y="{top + plot_h - bar_h:.1f}" width="{slot * 0.7:.1f}" height="{bar_h:.1f}" '
+                     f'fill="{colour}" stroke="#6a8fb5" stroke-width="0.5"><title>{escape(str(label))}: {int(value)}</title></rect>')
+        if rotate:
+            parts.append(f'<text font-size="9" text-anchor="end" transform="translate({cx:.1f},{top + plot_h + 10}) rotate(-30)">'
+                         f'{_label(label)}</text>')
+        else:
+            parts.append(f'<text x="{cx:.1f}" y="{top + plot_h + 12}" font-size="9" text-anchor="middle">{_label(label)}</text>')
+    parts.append(f'<text x="{left + plot_w / 2}" y="{height - 4}" font-size="10" text-anchor="middle">{escape(xlabel)}</text>'
+                 f'<text font-size="10" text-anchor="middle" transform="translate(10,{top + plot_h / 2}) rotate(-90)">Aantal</text>'
+                 '</svg>')
+    return "".join(parts)
+
+# Pie chart of a counts Series, with percentages in the legend
+def svg_pie_chart(counts, title):
+    width, height, radius = 320, 200, 70
+    cx, cy = 100, 110
+    total = int(counts.sum())
+    parts = [f'<svg viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" role="img">',
+             f'<text x="{width / 2}" y="16" font-size="12" text-anchor="middle" font-weight="bold">{escape(title)}</text>']
+    angle = -math.pi / 2
+    for i, (label, value, colour) in enumerate(zip(counts.index, counts.values, _palette(len(counts)))):
+        share = int(value) / total if total else 0
+        if share >= 1:
+            parts.append(f'<circle cx="{cx}" cy="{cy}" r="{radius}" fill="{colour}" stroke="#fff"/>')
+        elif share > 0:
+            end = angle + 2 * math.pi * share
+            x1, y1 = cx + radius * math.cos(angle), cy + radius * math.sin(angle)
+            x2, y2 = cx + radius * math.cos(end), cy + radius * math.sin(end)
+            large = 1 if share > 0.5 else 0
+            parts.append(f'<path d="M{cx},{cy} L{x1:.2f},{y1:.2f} A{radius},{radius} 0 {large} 1 {x2:.2f},{y2:.2f} Z" '
+                         f'fill="{colour}" stroke="#fff"/>')
+            angle = end
+        y = 50 + i * 18
+        parts.append(f'<rect x="190" y="{y - 9}" width="10" height="10" fill="{colour}" stroke="#6a8fb5" stroke-width="0.5"/>'
+                     f'<text x="206" y="{y}" font-size="10">{_label(label)} ({share * 100:.1f}%)</text>')
+    parts.append('</svg>')
+    return "".join(parts)
+
+def _analysis(counts):
+    charts = [
+        svg_bar_chart(counts['category'], 'Insidente volgens Kategorie', 'Kategorie'),
+        svg_bar_chart(top_counts(counts['incident'], 5), 'Insidente volgens Tipe', 'Insident'),
+        svg_bar_chart(top_counts(counts['teacher'], 5), 'Insidente volgens Onderwyser', 'Onderwyser'),
+        svg_bar_chart(top_counts(counts['class'], 5), 'Insidente volgens Klas', 'Klas'),
+        svg_pie_chart(counts['category'], 'Insident Verspreiding')
+    ]
+    return "<h2>Insident Analise</h2><div class=\"charts\">" + "".join(charts) + "</div>"
+
+def _page(title, body):
+    stream = io.BytesIO(PAGE.substitute(title=escape(title), body=body).encode("utf-8"))
+    stream.seek(0)
+    return stream
+
+# HTML counterpart of reports.generate_word_report
+def generate_html_report(df, counts=None):
+    if counts is None:
+        counts = count_incidents(df, keys=CHART_KEYS)
+    body = ["<h2>Insident Besonderhede</h2>", _incident_table(df), _analysis(counts),
+            "<h2>Leerders met Herhalende Insidente</h2>"]
+    high_risk_df = df[df['Learner_Full_Name'].isin(high_risk_learners(count_incidents(df, keys=['learner'])))]
+    if not high_risk_df.empty:
+        body.append(_incident_table(high_risk_df))
+    else:
+        body.append("<p>Geen leerders met herhalende insidente nie.</p>")
+    return _page('Insident Verslag', "\n".join(body))
+
+# HTML counterpart of reports.generate_learner_report
+def generate_learner_html_report(df, learner_full_name, period, start_date, end_date):
+    body = [f"<p class=\"meta\">Tydperk: {escape(period)}</p>",
+            f"<p class=\"meta\">Datum Reeks: {start_date.strftime('%Y-%m-%d')} tot {end_date.strftime('%Y-%m-%d')}</p>",
+            "<h2>Insident Besonderhede</h2>", _incident_table(df)]
+    if not df.empty:
+        counts = count_incidents(df, keys=['category'])
+        body.append("<h2>Insident Analise</h2><div class=\"charts\">"
+                    + svg_bar_chart(counts['category'], 'Insidente volgens Kategorie', 'Kategorie') + "</div>")
+    return _page(f'Insident Verslag vir {learner_full_name}', "\n".join(body))
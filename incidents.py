@@ -0,0 +1,483 @@
+import pandas as pd
+import numpy as np
+from datetime import datetime, timedelta
+import json
+import os
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+import pytz
+from normalize import canonicalize_frame
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to no cross-process locking
+    fcntl = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # no Arrow snapshot: the log is always parsed from the CSV
+    pa = feather = None
+
+SA_TZ = pytz.timezone('Africa/Johannesburg')
+
+# Mapping of incidents to categories based on the Code of Conduct
+INCIDENT_TO_CATEGORY = {
+    # Category 1: Minor offenses
+    "Strooi van vullis": "1",
+    "Eet in klas": "1",
+    "Onnet voorkoms": "1",
+    "Ontwrigtende gedrag in die klas": "1",
+    "Wangedrag tydens samekoms": "1",
+    "Betreding van verbode area": "1",
+    # Category 2: Moderate offenses
+    "Dros": "2",
+    "Laatkom": "2",
+    "Plagiaat": "2",
+    "Baklei": "2",
+    "Rook": "2",
+    "Beskadiging van eiendom": "2",
+    "Bedreiging": "2",
+    # Category 3: Serious offenses
+    "Boelie": "3",
+    "Seksuele teistering": "3",
+    "Rassistiese opmerkings": "3",
+    "Dwelmverbruik": "3",
+    "Onder invloed van alkohol": "3",
+    "Afkyk in eksamen": "3",
+    # Category 4: Severe offenses
+    "Aanranding": "4",
+    "Diefstal": "4",
+    "Dwelmverkoop": "4",
+    "Gevaarlike wapens": "4",
+    "Pornografie": "4",
+    "Vervalsing": "4",
+    # Default for unmapped incidents (can be adjusted manually)
+    "Onbekend": "1"
+}
+
+# Read and preprocess learner data
+def read_learner_data(path):
+    df = pd.read_csv(path, dtype={'klasgroep': str})
+    df.columns = df.columns.str.strip()
+    df['Learner_Full_Name'] = df['Leerder van'].fillna('') + ' ' + df['Leerner se naam'].fillna('')
+    df = df.rename(columns={
+        'klasgroep': 'Class',
+        'Opvoeder betrokke': 'Teacher',
+        'Wat het gebeur': 'Incident',
+        'Kategorie': 'Category',
+        'Kommentaar': 'Comment'
+    })
+    canonicalize_frame(df)
+    df['Comment'] = df['Comment'].fillna('Geen Kommentaar')
+    np.random.seed(42)
+    start_date = datetime(2024, 1, 1)
+    date_range = [start_date + timedelta(days=int(x)) for x in np.random.randint(0, 365, size=len(df))]
+    df['Date'] = pd.to_datetime(date_range).date
+    return df
+
+# Stable ID for a row written before the log had an Incident_ID column; it is
+# persisted the next time the log is compacted
+def legacy_incident_id(position, row):
+    return uuid.uuid5(uuid.NAMESPACE_OID, f"{position}|{row['Learner_Full_Name']}|{row['Date']}|{row['Comment']}").hex
+
+# Free-text columns, read as text so e.g. a numeric class code is not turned into "10.0"
+TEXT_COLUMNS = {'Learner_Full_Name': str, 'Learner_Name': str, 'Class': str, 'Teacher': str, 'Incident': str}
+
+# Apply the log's column fixes to a frame read from the CSV (whole or one chunk)
+def normalize_incident_log(df):
+    if 'Learner_Name' in df.columns and 'Learner_Full_Name' not in df.columns:
+        df = df.rename(columns={'Learner_Name': 'Learner_Full_Name'})
+    canonicalize_frame(df)
+    df['Date'] = pd.to_datetime(df['Date'], errors='coerce').dt.date
+    if 'Sanction_Resolved' not in df.columns:
+        df['Sanction_Resolved'] = False
+    df['Sanction_Resolved'] = df['Sanction_Resolved'].astype(bool)
+    return df
+
+# Columns of the incident log, in file order
+LOG_COLUMNS = ['Learner_Full_Name', 'Class', 'Teacher', 'Incident', 'Category', 'Comment', 'Date',
+               'Sanction_Resolved', 'Incident_ID']
+
+# Event stream next to the log: "incident_log.csv" -> "incident_log.events.jsonl".
+# The CSV is a snapshot; every change since then is one JSON line appended here.
+def events_path(path):
+    return f"{os.path.splitext(path)[0]}.events.jsonl"
+
+# Events folded into a snapshot are kept here as the audit trail
+def audit_path(path):
+    return f"{os.path.splitext(path)[0]}.audit.jsonl"
+
+# Events appended after byte `offset` of the event stream, and the offset to read on
+# from next time. A line still being written (no newline yet) is left for next time.
+def read_events_since(path, offset):
+    try:
+        with open(events_path(path), "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return [], 0
+    complete = data[:data.rfind(b"\n") + 1]
+    events = [json.loads(line) for line in complete.decode("utf-8").splitlines() if line.strip()]
+    return events, offset + len(complete)
+
+# Events in the order they were recorded
+def read_events(path):
+    try:
+        with open(events_path(path), encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+# The net effect of the events on the snapshot: snapshot rows deleted, Sanction_Resolved
+# overrides, and rows added since the snapshot (in the order they were added)
+def replay_events(events):
+    deleted, resolved, created = set(), {}, {}
+    for event in events:
+        if event['event'] == 'created':
+            for row in event['rows']:
+                created[row['Incident_ID']] = row
+        elif event['event'] == 'deleted':
+            for row in event['rows']:
+                if created.pop(row['Incident_ID'], None) is None:
+                    deleted.add(row['Incident_ID'])
+                resolved.pop(row['Incident_ID'], None)
+        elif event['event'] == 'restored':
+            for row in event['rows']:
+                if row['Incident_ID'] in deleted:
+                    deleted.discard(row['Incident_ID'])
+                    resolved[row['Incident_ID']] = row['Sanction_Resolved']
+                else:
+                    created[row['Incident_ID']] = row
+        elif event['event'] in ('resolved', 'reopened'):
+            for incident_id in event['ids']:
+                if incident_id in created:
+                    created[incident_id] = dict(created[incident_id], Sanction_Resolved=event['event'] == 'resolved')
+                else:
+                    resolved[incident_id] = event['event'] == 'resolved'
+    return deleted, resolved, list(created.values())
+
+# Apply replayed events to a snapshot frame (or one chunk of it)
+def _apply_replay(df, deleted, resolved):
+    if deleted:
+        df = df[~df['Incident_ID'].isin(deleted)]
+    if resolved:
+        overrides = df['Incident_ID'].map(resolved)
+        if overrides.notna().any():
+            df = df.copy()
+            df['Sanction_Resolved'] = np.where(overrides.notna(), overrides, df['Sanction_Resolved']).astype(bool)
+    return df
+
+# Rows of an event as a normalized log frame
+def event_rows_frame(rows):
+    return normalize_incident_log(pd.DataFrame(rows))
+
+def _fill_incident_ids(df):
+    if 'Incident_ID' not in df.columns:
+        df['Incident_ID'] = None
+    missing = df['Incident_ID'].isna()
+    if missing.any():
+        df.loc[missing, 'Incident_ID'] = [legacy_incident_id(i, row) for i, row in df[missing].iterrows()]
+    return df
+
+# Columnar copy of the snapshot next to the log: "incident_log.csv" -> "incident_log.arrow"
+def arrow_path(path):
+    return f"{os.path.splitext(path)[0]}.arrow"
+
+def _csv_stamp(path):
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}".encode()
+
+# Write the parsed, normalized snapshot as Feather, stamped with `stamp`, the _csv_stamp of
+# the CSV it was read from (taken before reading it). Written to a temporary file of its own
+# and renamed, so readers in other processes never see half of it.
+def _write_arrow_snapshot(path, df, stamp):
+    if feather is None:
+        return
+    temp_path = None
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b'csv': stamp})
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(arrow_path(path)) or ".",
+                                         prefix=f"{os.path.splitext(os.path.basename(path))[0]}.",
+                                         suffix=".arrow.tmp")
+        os.close(fd)
+        feather.write_feather(table, temp_path, compression='uncompressed')
+        os.replace(temp_path, arrow_path(path))
+    except (pa.ArrowException, OSError):
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
+        # readers fall back to the CSV
+
+# The snapshot from the Feather copy, memory-mapped instead of parsing CSV text and dates;
+# None when there is no copy or it was made from another version of the CSV
+def _read_arrow_snapshot(path):
+    if feather is None or not os.path.exists(arrow_path(path)):
+        return None
+    try:
+        table = feather.read_table(arrow_path(path), memory_map=True)
+        if (table.schema.metadata or {}).get(b'csv') != _csv_stamp(path):
+            return None
+        df = table.to_pandas(date_as_object=True)
+    except (pa.ArrowException, OSError):
+        return None
+    df['Date'] = df['Date'].where(df['Date'].notna(), pd.NaT)  # missing dates as the CSV path gives them
+    return df
+
+def _read_snapshot(path):
+    try:
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            df = _read_arrow_snapshot(path)
+            if df is None:
+                stamp = _csv_stamp(path)
+                df = _fill_incident_ids(normalize_incident_log(pd.read_csv(path, dtype=TEXT_COLUMNS)))
+                # Without the log lock a compaction may have replaced the CSV while it was read
+                if _csv_stamp(path) == stamp:
+                    _write_arrow_snapshot(path, df, stamp)
+            return df
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        pass
+    return pd.DataFrame(columns=LOG_COLUMNS)
+
+# Read or initialize incident log with Sanction_Resolved and Incident_ID columns:
+# the last snapshot with the events recorded since replayed over it
+def read_incident_log(path):
+    df = _read_snapshot(path)
+    events = read_events(path)
+    if not events:
+        return df
+    deleted, resolved, created = replay_events(events)
+    df = _apply_replay(df, deleted, resolved)
+    if created:
+        df = pd.concat([df, event_rows_frame(created)], ignore_index=True) if len(df) else event_rows_frame(created)
+    return df.reset_index(drop=True)
+
+# Read the log in chunks of `chunksize` rows, normalized like read_incident_log.
+# Only `columns` are parsed (all when None), so free-text comments can be skipped.
+# Rows added since the last snapshot come last, as one more chunk.
+def iter_incident_log(path, chunksize=50000, columns=None):
+    events = read_events(path)
+    deleted, resolved, created = replay_events(events)
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        wanted = None if columns is None else set(columns) | {'Learner_Name'}
+        if wanted is not None and events:
+            wanted.add('Incident_ID')
+            if 'Incident_ID' not in pd.read_csv(path, nrows=0).columns:
+                # Legacy IDs are derived from these columns
+                wanted |= {'Learner_Full_Name', 'Date', 'Comment'}
+        usecols = None if wanted is None else (lambda column: column in wanted)
+        for chunk in pd.read_csv(path, dtype=TEXT_COLUMNS, usecols=usecols, chunksize=chunksize):
+            chunk = normalize_incident_log(chunk)
+            if events:
+                chunk = _apply_replay(_fill_incident_ids(chunk), deleted, resolved)
+            yield chunk
+    if created:
+        chunk = event_rows_frame(created)
+        yield chunk if columns is None else chunk[[c for c in chunk.columns if c in set(columns)]]
+
+# Build a one-row frame for a new incident, dated today unless a date is given
+def new_incident_row(learner_full_name, class_, teacher, incident, category, comment, date=None):
+    return canonicalize_frame(pd.DataFrame({
+        'Learner_Full_Name': [learner_full_name],
+        'Class': [class_],
+        'Teacher': [teacher],
+        'Incident': [incident],
+        'Category': [category],
+        'Comment': [comment],
+        'Date': [date or datetime.now(SA_TZ).date()],
+        'Sanction_Resolved': [False],
+        'Incident_ID': [uuid.uuid4().hex]
+    }))
+
+# Version of the log on disk; changes on every write by any process
+def log_version(path):
+    version = ()
+    for file_path in (path, events_path(path)):
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            version += (None,)
+            continue
+        version += ((stat.st_mtime_ns, stat.st_size),)
+    return None if version == (None, None) else version
+
+# Exclusive lock on a lock file, across threads and processes (and app replicas sharing
+# the directory). With blocking=False it does not wait: it yields False if the lock is held.
+@contextmanager
+def file_lock(lock_path, blocking=True):
+    with open(lock_path, "a") as lock_file:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+# Exclusive lock around read-modify-write of the log: the single writer at a time
+def log_lock(path):
+    return file_lock(f"{path}.lock")
+
+# Rows as JSON-ready dicts for an event
+def _event_rows(df):
+    columns = list(df.columns) + [column for column in LOG_COLUMNS if column not in df.columns]
+    df = df.reindex(columns=columns)
+    rows = df.astype(object).where(df.notna(), None).to_dict('records')
+    for row in rows:
+        row['Date'] = None if row['Date'] is None else str(row['Date'])
+        row['Sanction_Resolved'] = bool(row['Sanction_Resolved'])
+    return rows
+
+# Events recorded since the last snapshot before it is compacted; set
+# INSIDENT_COMPACT_EVERY=0 to only compact on request (cli.py kompakteer)
+COMPACT_EVERY = int(os.environ.get("INSIDENT_COMPACT_EVERY", "500"))
+
+# Number of events per log as (file size, count), so an append does not have to count
+# (let alone parse) the whole stream again. Counted afresh when another process appended.
+_event_counts = {}
+
+# Events in the first `size` bytes of the stream
+def _count_events(path, size):
+    cached = _event_counts.get(path)
+    if cached is not None and cached[0] == size:
+        return cached[1]
+    count = 0
+    with open(events_path(path), "rb") as f:
+        for block in iter(lambda: f.read(min(1 << 20, size - f.tell())), b""):
+            count += block.count(b"\n")
+    return count
+
+# Append one event to the stream. Call with log_lock held.
+def _record_event(path, event, **fields):
+    record = {'event': event, 'id': uuid.uuid4().hex, 'at': datetime.now(SA_TZ).isoformat(timespec='seconds')}
+    record.update(fields)
+    with open(events_path(path), "ab") as f:
+        start = f.tell()
+        f.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        end = f.tell()
+    count = _count_events(path, start) + 1
+    _event_counts[path] = (end, count)
+    if COMPACT_EVERY and count >= COMPACT_EVERY:
+        _compact(path)
+    return record
+
+# Write the current state as the new snapshot and move the events into the audit trail.
+# Call with log_lock held.
+def _compact(path):
+    events = read_events(path)
+    if not events:
+        return False
+    incident_log = read_incident_log(path)
+    temp_path = f"{path}.tmp"
+    incident_log.to_csv(temp_path, index=False)
+    os.replace(temp_path, path)
+    _write_arrow_snapshot(path, incident_log, _csv_stamp(path))
+    with open(audit_path(path), "a", encoding="utf-8") as f:
+        f.writelines(json.dumps(event, ensure_ascii=False) + "\n" for event in events)
+    os.remove(events_path(path))
+    _event_counts.pop(path, None)
+    return True
+
+# Fold the event stream into a new snapshot; returns False when there was nothing to fold
+def compact_incident_log(path):
+    with log_lock(path):
+        return _compact(path)
+
+# Append new incidents to the log as one 'created' event, so a save costs one small
+# write however long the log is. Returns the log versions (before, after) the write.
+def append_incidents(path, new_incidents):
+    with log_lock(path):
+        before = log_version(path)
+        _record_event(path, 'created', rows=_event_rows(new_incidents))
+        return before, log_version(path)
+
+# Rows belonging to any of the (learner, category) sanctions
+def sanction_mask(incident_log, sanctions):
+    pairs = pd.MultiIndex.from_arrays([incident_log['Learner_Full_Name'], incident_log['Category']])
+    return pairs.isin([tuple(sanction) for sanction in sanctions])
+
+# Mark the incidents of each (learner, category) sanction as resolved, all in one event.
+# Only incidents not yet resolved are recorded, so undoing it reopens just those.
+# Returns the log versions (before, after) the write, or None if nothing was open.
+def mark_sanctions_resolved(path, sanctions):
+    with log_lock(path):
+        before = log_version(path)
+        incident_log = read_incident_log(path)
+        mask = sanction_mask(incident_log, sanctions) & ~incident_log['Sanction_Resolved'].to_numpy(dtype=bool)
+        if not mask.any():
+            return None
+        _record_event(path, 'resolved', ids=incident_log.loc[mask, 'Incident_ID'].tolist(),
+                      sanctions=[list(sanction) for sanction in sanctions])
+        return before, log_version(path)
+
+# Remove one incident by Incident_ID.
+# Returns (removed rows, (before, after) versions), or (None, None) if it was not found.
+def remove_incident(path, incident_id):
+    with log_lock(path):
+        before = log_version(path)
+        incident_log = read_incident_log(path)
+        mask = incident_log['Incident_ID'] == incident_id
+        if not mask.any():
+            return None, None
+        _record_event(path, 'deleted', rows=_event_rows(incident_log[mask]))
+        return incident_log[mask], (before, log_version(path))
+
+# The event each kind of event is undone by
+UNDO_EVENTS = {
+    'created': 'deleted',
+    'deleted': 'restored',
+    'restored': 'deleted',
+    'resolved': 'reopened',
+    'reopened': 'resolved'
+}
+
+# Per log: the first line of the event stream read so far, the offset read up to, and the
+# events not undone, so each rerun only parses events appended since the last one
+_undo_cursors = {}
+_undo_lock = threading.Lock()
+
+def _first_event_line(path):
+    try:
+        with open(events_path(path), "rb") as f:
+            return f.readline()
+    except FileNotFoundError:
+        return b""
+
+# Call with log_lock held, so the stream is not compacted while it is read
+def _last_undoable_event(path):
+    first = _first_event_line(path)
+    with _undo_lock:
+        cursor = _undo_cursors.get(path)
+        if cursor is None or cursor['first'] != first:
+            # New stream after a compaction: read it from the start
+            cursor = _undo_cursors[path] = {'first': first, 'offset': 0, 'open': []}
+        events, cursor['offset'] = read_events_since(path, cursor['offset'])
+        for event in events:
+            if 'undoes' in event:
+                cursor['open'] = [done for done in cursor['open'] if done['id'] != event['undoes']]
+            else:
+                cursor['open'].append(event)
+        return cursor['open'][-1] if cursor['open'] else None
+
+# Latest event since the last snapshot that has not been undone (undo events themselves excluded)
+def last_undoable_event(path):
+    with log_lock(path):
+        return _last_undoable_event(path)
+
+# Undo the latest change by recording its opposite. Returns the undone event, or None
+# if there is nothing to undo (changes folded into a snapshot can no longer be undone).
+def undo_last_event(path):
+    with log_lock(path):
+        event = _last_undoable_event(path)
+        if event is None:
+            return None
+        fields = {key: event[key] for key in ('rows', 'ids', 'sanctions', 'learner', 'category') if key in event}
+        _record_event(path, UNDO_EVENTS[event['event']], undoes=event['id'], **fields)
+        return event
@@ -0,0 +1,232 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+import pandas as pd
+from incidents import INCIDENT_TO_CATEGORY, append_incidents, new_incident_row, read_learner_data
+from normalize import CANONICAL_COLUMNS, CATEGORIES
+from schools import load_schools
+from sync import log_error, push_incident_log
+
+# Local HTTP/JSON endpoint for logging incidents from a shared tablet form or a script:
+#
+#   POST /skole/<skool>/insidente   one incident object, or a list of them
+#   GET  /gesondheid
+#
+# An incident has Learner_Full_Name, Class, Teacher, Incident and Comment, and
+# optionally Category (default from INCIDENT_TO_CATEGORY) and Date (YYYY-MM-DD, default today).
+# Requests are validated against the school's roster, then queued for a group-commit
+# writer that appends everything queued since its last flush in one disk write.
+
+MAX_BODY_BYTES = 1024 * 1024
+REQUIRED_FIELDS = ['Learner_Full_Name', 'Class', 'Teacher', 'Incident', 'Comment']
+
+# Names that may be used for a school, taken from its roster once at startup
+class Roster:
+    def __init__(self, learner_df):
+        self.learners = set(learner_df['Learner_Full_Name'])
+        self.classes = set(learner_df['Class'].astype(str))
+        self.teachers = set(learner_df['Teacher'])
+        self.incidents = set(learner_df['Incident']) | set(INCIDENT_TO_CATEGORY)
+
+    # Return (incident row, None) for a valid submission, else (None, error message)
+    def validate(self, item):
+        if not isinstance(item, dict):
+            return None, "Insident moet 'n JSON objek wees."
+        # Lists, objects and numbers would fail the roster and date checks below (Category may be a number)
+        not_text = [field for field in REQUIRED_FIELDS + ['Category', 'Date'] if item.get(field) is not None
+                    and not isinstance(item[field], str) and not (field == 'Category' and type(item[field]) is int)]
+        if not_text:
+            return None, f"Velde moet teks wees: {', '.join(not_text)}"
+        missing = [field for field in REQUIRED_FIELDS if not str(item.get(field) or '').strip()]
+        if missing:
+            return None, f"Ontbrekende velde: {', '.join(missing)}"
+        values = {}
+        for field, allowed in (('Learner_Full_Name', self.learners), ('Class', self.classes),
+                               ('Teacher', self.teachers), ('Incident', self.incidents)):
+            values[field] = CANONICAL_COLUMNS[field](item[field])
+            if values[field] not in allowed:
+                return None, f"Onbekende {field}: {item[field]}"
+        category = str(item.get('Category') or INCIDENT_TO_CATEGORY.get(values['Incident'], '1')).strip()
+        if category not in CATEGORIES:
+            return None, f"Ongeldige Category: {category}"
+        date = None
+        if item.get('Date'):
+            try:
+                date = pd.Timestamp(item['Date']).date()
+            except (TypeError, ValueError):
+                return None, f"Ongeldige Date: {item['Date']}"
+        row = new_incident_row(values['Learner_Full_Name'], values['Class'], values['Teacher'], values['Incident'],
+                               category, item['Comment'], date=date)
+        return row, None
+
+class _Pending:
+    def __init__(self, rows):
+        self.rows = rows
+        self.done = threading.Event()
+        self.error = None
+
+# Collects submissions from many request threads and writes them in batches: the
+# writer takes everything queued within `max_delay` seconds of the first submission
+# (up to `max_batch` incidents) and appends it to the log with a single write.
+# GitHub pushes are coalesced so at most one is queued behind the one running.
+class GroupCommitWriter:
+    def __init__(self, school, max_batch=500, max_delay=0.005):
+        self.school = school
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._push_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"push-{school['key']}")
+        self._push_pending = threading.Event()
+        threading.Thread(target=self._run, name=f"writer-{school['key']}", daemon=True).start()
+
+    # Queue rows and block until they are on disk; raises if the write failed
+    def submit(self, rows):
+        pending = _Pending(rows)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0].rows)
+            deadline = time.monotonic() + self.max_delay
+            while size < self.max_batch:
+                try:
+                    pending = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(pending)
+                size += len(pending.rows)
+
+            error = None
+            try:
+                append_incidents(self.school['incident_log'], pd.concat([p.rows for p in batch], ignore_index=True))
+            except Exception as e:
+                log_error(f"Ingest write failed ({self.school['key']}): {str(e)}")
+                error = e
+            for pending in batch:
+                pending.error = error
+                pending.done.set()
+            if error is None:
+                self._schedule_push(size)
+
+    def _schedule_push(self, count):
+        token = os.environ.get(self.school['github_token_secret'])
+        if not self.school['github_repo'] or not token or self._push_pending.is_set():
+            return
+        self._push_pending.set()
+
+        def push():
+            self._push_pending.clear()
+            push_incident_log(token, self.school, f"with {count} ingested incident(s)")
+        self._push_pool.submit(push)
+
+class IngestServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+class IngestHandler(BaseHTTPRequestHandler):
+    server_version = "InsidentIngest/1.0"
+    # Filled in by serve(): {school_key: (Roster, GroupCommitWriter)}
+    tenants = {}
+    api_token = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/gesondheid":
+            self._reply(200, {"skole": sorted(self.tenants)})
+        else:
+            self._reply(404, {"fout": "Onbekende pad"})
+
+    def do_POST(self):
+        parts = urlparse(self.path).path.strip("/").split("/")
+        if len(parts) != 3 or parts[0] != "skole" or parts[2] != "insidente":
+            self._reply(404, {"fout": "Onbekende pad"})
+            return
+        if parts[1] not in self.tenants:
+            self._reply(404, {"fout": f"Onbekende skool: {parts[1]}"})
+            return
+        if self.api_token and self.headers.get("Authorization") != f"Bearer {self.api_token}":
+            self._reply(401, {"fout": "Ongeldige sleutel"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._reply(400, {"fout": "Ongeldige Content-Length"})
+            return
+        if length > MAX_BODY_BYTES:
+            self._reply(413, {"fout": "Versoek te groot"})
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b"null")
+        except ValueError:
+            self._reply(400, {"fout": "Ongeldige JSON"})
+            return
+
+        roster, writer = self.tenants[parts[1]]
+        items = payload if isinstance(payload, list) else [payload]
+        rows, errors = [], []
+        for i, item in enumerate(items):
+            row, error = roster.validate(item)
+            if error:
+                errors.append({"indeks": i, "fout": error})
+            else:
+                rows.append(row)
+        if errors or not rows:
+            self._reply(400, {"foute": errors or [{"indeks": 0, "fout": "Geen insidente nie"}]})
+            return
+
+        new_incidents = pd.concat(rows, ignore_index=True)
+        try:
+            writer.submit(new_incidents)
+        except Exception:
+            self._reply(500, {"fout": "Kon nie stoor nie"})
+            return
+        self._reply(201, {"Incident_ID": new_incidents['Incident_ID'].tolist()})
+
+def serve(schools, host, port, api_token=None):
+    IngestHandler.tenants = {
+        key: (Roster(read_learner_data(school['learner_list'])), GroupCommitWriter(school))
+        for key, school in schools.items()
+    }
+    IngestHandler.api_token = api_token
+    server = IngestServer((host, port), IngestHandler)
+    print(f"Luister op http://{host}:{port} vir {', '.join(schools)}")
+    server.serve_forever()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plaaslike HTTP/JSON API om insidente te stoor.")
+    parser.add_argument("--gasheer", default="127.0.0.1", help="Adres om op te luister (verstek: net hierdie rekenaar)")
+    parser.add_argument("--poort", type=int, default=8502)
+    parser.add_argument("--skool", action="append", help="Skool sleutel (herhaal vir meer as een; verstek: alle skole)")
+    args = parser.parse_args(argv)
+
+    schools = load_schools()
+    keys = args.skool or list(schools)
+    unknown = [key for key in keys if key not in schools]
+    if unknown:
+        parser.error(f"Onbekende skool: {', '.join(unknown)}")
+    serve({key: schools[key] for key in keys}, args.gasheer, args.poort, os.environ.get("INSIDENT_API_TOKEN"))
+
+if __name__ == "__main__":
+    main()
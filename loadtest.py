@@ -0,0 +1,226 @@
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import warnings
+import numpy as np
+from incidents import events_path, read_incident_log, read_learner_data
+from schools import load_schools
+
+# Load test for report.py: N simulated staff sessions, started together like the
+# break-time rush, each doing a random mix of saves, filters, paging and report
+# downloads through Streamlit's headless AppTest. Runs against a throw-away copy of
+# the school's log (no GitHub pushes) and reports rerun latency percentiles per
+# action and how many saved incidents did not make it into the log.
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "report.py")
+
+# Relative weight of each action in a session
+ACTION_WEIGHTS = {
+    'stoor': 3,
+    'filter': 3,
+    'blaai': 2,
+    'verslag': 1
+}
+
+PERCENTILES = [50, 90, 99]
+
+# Copy a school's log (snapshot and events) and roster into `workdir` and point a
+# one-school registry at them
+def prepare_school(school, workdir):
+    copy = {key: value for key, value in school.items() if key != 'key'}
+    for path_key in ('incident_log', 'learner_list'):
+        copy[path_key] = os.path.join(workdir, os.path.basename(school[path_key]))
+        if os.path.exists(school[path_key]):
+            shutil.copy(school[path_key], copy[path_key])
+    if os.path.exists(events_path(school['incident_log'])):
+        shutil.copy(events_path(school['incident_log']), events_path(copy['incident_log']))
+    copy.update(artifact_dir=os.path.join(workdir, 'artifacts'), github_repo=None, passcode_secret=None)
+    registry = os.path.join(workdir, 'schools.json')
+    with open(registry, 'w', encoding='utf-8') as f:
+        json.dump({school['key']: copy}, f, ensure_ascii=False)
+    return registry, copy
+
+def _button(at, label, form=False):
+    return next((b for b in at.button if b.label == label and bool(b.form_id) == form), None)
+
+def _options(at, key):
+    return [option for option in at.selectbox(key=key).options if option not in ('Kies', 'Alle')]
+
+def action_save(at, rng, roster, marker):
+    row = roster[rng.randrange(len(roster))]
+    at.selectbox(key="learner_full_name").set_value(row['Learner_Full_Name'])
+    at.selectbox(key="class").set_value(row['Class'])
+    at.selectbox(key="teacher").set_value(row['Teacher'])
+    at.selectbox(key="incident").set_value(row['Incident'])
+    at.selectbox(key="category").set_value(rng.choice(['1', '2', '3', '4']))
+    at.text_area(key="comment").input(marker)
+    _button(at, "Stoor Insident").click()
+
+def action_filter(at, rng, roster, marker):
+    key = rng.choice(["filter_class", "filter_teacher", "filter_incident", "filter_category"])
+    at.selectbox(key=key).set_value(rng.choice(['Alle'] + _options(at, key)))
+
+def action_page(at, rng, roster, marker):
+    button = _button(at, "Volgende", form=True)
+    if button is None or button.disabled:
+        button = _button(at, "Vorige", form=True)
+    if button is not None:
+        button.click()
+
+def action_report(at, rng, roster, marker):
+    learners = _options(at, "learner_report_name")
+    if learners:
+        at.selectbox(key="learner_report_name").set_value(rng.choice(learners))
+        at.selectbox(key="report_period").set_value(rng.choice(at.selectbox(key="report_period").options))
+        _button(at, "Genereer Leerder Verslag").click()
+
+ACTIONS = {
+    'stoor': action_save,
+    'filter': action_filter,
+    'blaai': action_page,
+    'verslag': action_report
+}
+
+def run_session(number, school_key, actions, think_time, roster, seed, start, results):
+    from streamlit.testing.v1 import AppTest
+    rng = random.Random(seed + number)
+    at = AppTest.from_file(APP_PATH, default_timeout=300)
+    at.query_params["skool"] = school_key
+    at.session_state["school_key"] = school_key
+    began = time.perf_counter()
+    at.run()
+    results['timings'].append(('laai', time.perf_counter() - began))
+    start.wait()
+    for i in range(actions):
+        name = rng.choices(list(ACTION_WEIGHTS), weights=list(ACTION_WEIGHTS.values()))[0]
+        marker = f"lastoets {number}-{i} {uuid.uuid4().hex[:8]}"
+        try:
+            ACTIONS[name](at, rng, roster, marker)
+            began = time.perf_counter()
+            at.run()
+            results['timings'].append((name, time.perf_counter() - began))
+        except Exception as e:
+            results['errors'].append(f"sessie {number} {name}: {e}")
+            continue
+        if at.exception:
+            results['errors'].extend(f"sessie {number} {name}: {e.message}" for e in at.exception)
+        elif name == 'stoor':
+            results['saved'].append(marker)
+        if think_time:
+            time.sleep(rng.uniform(0, think_time))
+
+# One mock Streamlit runtime for all sessions, set up the way AppTest sets up its own
+def shared_test_runtime():
+    from unittest.mock import MagicMock
+    from streamlit.components.v2.component_manager import BidiComponentManager
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    components = BidiComponentManager()
+    components.discover_and_register_components(start_file_watching=False)
+    runtime.bidi_component_registry = components
+    return runtime
+
+# Sessions run in threads of this process, like a Streamlit server's sessions, so they
+# share st.cache_resource (the shared log and its indexes) and compete for the GIL.
+def run_load_test(school, sessions, actions, think_time=0.0, seed=0):
+    from unittest.mock import patch
+    from streamlit.runtime import Runtime
+    from streamlit.testing.v1.util import patch_config_options
+    workdir = tempfile.mkdtemp(prefix="insident-lastoets-")
+    registry, copy = prepare_school(school, workdir)
+    os.environ["INSIDENT_SCHOOLS"] = registry
+    os.environ["INSIDENT_PRERENDER_INTERVAL"] = "0"
+    os.environ["INSIDENT_LOG_POLL_INTERVAL"] = "0"
+    roster = read_learner_data(copy['learner_list']).to_dict('records')
+    results = {'timings': [], 'errors': [], 'saved': []}
+    start = threading.Barrier(sessions)
+    threads = [
+        threading.Thread(target=run_session, args=(n, school['key'], actions, think_time, roster, seed, start, results))
+        for n in range(sessions)
+    ]
+    # Every AppTest run switches on global.appTest and points the Runtime singleton at a
+    # mock for its duration, and undoes both at the end, which would cut them off under
+    # runs still going in other threads. Keep them in place for the whole test instead:
+    # the runs set and clear the singleton of a Runtime subclass, which nothing reads.
+    runtime_class = type("Runtime", (Runtime,), {})
+    with patch_config_options({"global.appTest": True}), \
+            patch("streamlit.testing.v1.app_test.Runtime", runtime_class), \
+            patch.object(Runtime, "_instance", shared_test_runtime()):
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results['elapsed'] = time.perf_counter() - began
+
+    stored = set(read_incident_log(copy['incident_log'])['Comment'])
+    results['lost'] = [marker for marker in results['saved'] if marker not in stored]
+    results['workdir'] = workdir
+    return results
+
+# Latency percentiles in milliseconds per action, plus all actions together
+def summarize(timings):
+    rows = []
+    by_action = {}
+    for name, seconds in timings:
+        by_action.setdefault(name, []).append(seconds * 1000)
+    actions = [name for name in ['laai'] + list(ACTION_WEIGHTS) if name in by_action]
+    everything = [ms for name, values in by_action.items() if name != 'laai' for ms in values]
+    for name, values in [(name, by_action[name]) for name in actions] + [('alle aksies', everything)]:
+        if not values:
+            continue
+        row = {'Aksie': name, 'Aantal': len(values)}
+        row.update({f"p{p}": round(float(np.percentile(values, p))) for p in PERCENTILES})
+        row['Maks'] = round(max(values))
+        rows.append(row)
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lastoets vir report.py met gelyktydige sessies.")
+    parser.add_argument("--skool", help="Skool sleutel uit schools.json (verstek: die eerste skool)")
+    parser.add_argument("--sessies", type=int, default=10, help="Aantal gelyktydige sessies")
+    parser.add_argument("--aksies", type=int, default=20, help="Aksies per sessie")
+    parser.add_argument("--dinktyd", type=float, default=0.0, help="Maksimum sekondes tussen aksies")
+    parser.add_argument("--saad", type=int, default=0, help="Saad vir die willekeurige aksies")
+    parser.add_argument("--hou", action="store_true", help="Hou die tydelike kopie van die log")
+    args = parser.parse_args(argv)
+    logging.disable(logging.WARNING)
+    warnings.simplefilter("ignore", FutureWarning)
+
+    schools = load_schools()
+    key = args.skool or next(iter(schools))
+    if key not in schools:
+        parser.error(f"Onbekende skool: {key}")
+    results = run_load_test(schools[key], args.sessies, args.aksies, args.dinktyd, args.saad)
+
+    rows = summarize(results['timings'])
+    print(f"{args.sessies} sessies x {args.aksies} aksies in {results['elapsed']:.1f}s")
+    print(f"{'Aksie':<12}{'Aantal':>8}" + "".join(f"{f'p{p}':>9}" for p in PERCENTILES) + f"{'Maks':>9}  (ms)")
+    for row in rows:
+        print(f"{row['Aksie']:<12}{row['Aantal']:>8}" + "".join(f"{row[f'p{p}']:>9}" for p in PERCENTILES)
+              + f"{row['Maks']:>9}")
+    print(f"Gestoor: {len(results['saved'])}, verlore: {len(results['lost'])}, foute: {len(results['errors'])}")
+    for error in results['errors'][:10]:
+        print(f"  {error}")
+    if args.hou:
+        print(f"Tydelike kopie: {results['workdir']}")
+    else:
+        shutil.rmtree(results['workdir'], ignore_errors=True)
+    return 1 if results['lost'] or results['errors'] else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
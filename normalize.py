@@ -0,0 +1,77 @@
+import re
+import sys
+import numpy as np
+import pandas as pd
+
+# Canonical spellings for the columns that are grouped and filtered on. Every function
+# works on one value; canonicalize() applies it once per distinct value of a column
+# (a lookup table) and maps the rows through it, so a column with 10 000 rows and 40
+# classes costs 40 calls, and equal values end up sharing one string object.
+
+# Category domain of the Code of Conduct; anything else becomes DEFAULT_CATEGORY
+CATEGORIES = ['1', '2', '3', '4']
+DEFAULT_CATEGORY = '1'
+
+UNKNOWN = 'Onbekend'
+
+CLASS_RE = re.compile(r"^(\d{1,2})\s*([A-Za-z])\s*(\(.*\))?$")
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NA
+
+# Trim and collapse runs of whitespace: " ABDI  Abdihafid " -> "ABDI Abdihafid"
+def clean_text(value, default=UNKNOWN):
+    if _is_missing(value):
+        return default
+    text = " ".join(str(value).split())
+    return text or default
+
+# Learner names: whitespace only, the case is kept as captured
+def canonical_name(value):
+    return clean_text(value)
+
+# Class codes as grade, space, upper-case letter: "10d", "10D", " 10 d " -> "10 D",
+# "9b (eng)" -> "9 B (ENG)". Codes in another shape are only trimmed.
+def canonical_class(value):
+    text = clean_text(value)
+    if text.endswith(".0") and text[:-2].isdigit():
+        text = text[:-2]
+    match = CLASS_RE.match(text)
+    if not match:
+        return text
+    grade, letter, suffix = match.groups()
+    return f"{int(grade)} {letter.upper()}" + (f" {suffix.upper()}" if suffix else "")
+
+# Teacher names: whitespace only
+def canonical_teacher(value):
+    return clean_text(value)
+
+# Category as one of CATEGORIES: 2, 2.0, "2", " 2 " -> "2"
+def canonical_category(value):
+    try:
+        category = str(int(float(str(value).strip())))
+    except (ValueError, OverflowError):
+        return DEFAULT_CATEGORY
+    return category if category in CATEGORIES else DEFAULT_CATEGORY
+
+# Which canonical form applies to which column
+CANONICAL_COLUMNS = {
+    'Learner_Full_Name': canonical_name,
+    'Class': canonical_class,
+    'Teacher': canonical_teacher,
+    'Incident': clean_text,
+    'Category': canonical_category
+}
+
+# Map a column through `canonical`, computing it once per distinct value
+def canonicalize(series, canonical):
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    table = np.array([sys.intern(canonical(value)) for value in uniques] or [None], dtype=object)
+    return pd.Series(table[codes], index=series.index, name=series.name, dtype=object)
+
+# Canonicalize every known column present in `df`, in place
+def canonicalize_frame(df):
+    for column, canonical in CANONICAL_COLUMNS.items():
+        if column in df.columns:
+            df[column] = canonicalize(df[column], canonical)
+    return df
@@ -0,0 +1,77 @@
+import argparse
+import threading
+from datetime import datetime
+import pytz
+from artifacts import FULL_LOG_KEY, artifact_key, get_or_render, prune_artifacts
+from incidents import file_lock, read_incident_log
+from reports import generate_learner_report, generate_word_report, previous_period_range
+from schools import load_schools
+
+# Periods that are pre-rendered once they have closed
+PRERENDER_PERIODS = ['Weekliks', 'Maandelik', 'Kwartaalliks']
+
+# Render the full-log report and, for each closed period, the school-wide and per-learner reports.
+# Artifacts whose inputs have not changed are skipped, so repeated runs are cheap; blobs
+# that no report points at any more are pruned afterwards.
+def prerender_school(school, today):
+    incident_log = read_incident_log(school['incident_log'])
+    if incident_log.empty:
+        return 0
+    rendered = 0
+    _, was_rendered = get_or_render(school, FULL_LOG_KEY, incident_log, lambda: generate_word_report(incident_log))
+    rendered += was_rendered
+
+    for period in PRERENDER_PERIODS:
+        start_date, end_date = previous_period_range(period, today)
+        period_log = incident_log[(incident_log['Date'] >= start_date) & (incident_log['Date'] <= end_date)]
+        if period_log.empty:
+            continue
+        key = artifact_key(period, start_date, end_date)
+        _, was_rendered = get_or_render(school, key, period_log, lambda: generate_word_report(period_log))
+        rendered += was_rendered
+        for learner, learner_log in period_log.groupby('Learner_Full_Name'):
+            key = artifact_key(period, start_date, end_date, learner)
+            _, was_rendered = get_or_render(
+                school, key, learner_log,
+                lambda: generate_learner_report(learner_log, learner, period, start_date, end_date)
+            )
+            rendered += was_rendered
+    prune_artifacts(school)
+    return rendered
+
+# Pre-render every school, then repeat every `interval` seconds (0 runs once)
+def run_scheduler(schools, interval, stop_event=None, day=None):
+    stop_event = stop_event or threading.Event()
+    while True:
+        today = day or datetime.now(pytz.timezone('Africa/Johannesburg')).date()
+        for school in schools:
+            try:
+                # With several app replicas, one renders a school while the others skip it
+                with file_lock(f"{school['incident_log']}.prerender.lock", blocking=False) as locked:
+                    if not locked:
+                        continue
+                    prerender_school(school, today)
+            except Exception as e:
+                with open("error_log.txt", "a") as f:
+                    f.write(f"Pre-render failed ({school['key']}): {str(e)}\n")
+        if interval <= 0 or stop_event.wait(interval):
+            return
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genereer verslae vir afgeslote tydperke vooraf.")
+    parser.add_argument("--skool", action="append", help="Skool sleutel (herhaal vir meer as een; verstek: alle skole)")
+    parser.add_argument("--herhaal", type=int, default=0, metavar="SEKONDES",
+                        help="Herhaal elke SEKONDES in plaas van een keer te loop")
+    parser.add_argument("--datum", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date(),
+                        help="Genereer asof vandag hierdie datum (JJJJ-MM-DD) is, bv. om ou tydperke in te haal")
+    args = parser.parse_args(argv)
+
+    schools = load_schools()
+    keys = args.skool or list(schools)
+    unknown = [key for key in keys if key not in schools]
+    if unknown:
+        parser.error(f"Onbekende skool: {', '.join(unknown)}")
+    run_scheduler([schools[key] for key in keys], args.herhaal, day=args.datum)
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,34 @@
 import streamlit as st
-import pandas as pd
+import hashlib
 import numpy as np
-from datetime import datetime, timedelta
-from docx import Document
-from docx.shared import Inches
+from datetime import datetime
 import matplotlib.pyplot as plt
 import seaborn as sns
-import io
 import pytz
 from matplotlib.ticker import MaxNLocator
 import uuid
-from github import Github
 import base64
 import os
 import time
-
-# Set seaborn style for lightweight charts
-sns.set_style("whitegrid")
-plt.rcParams['font.size'] = 8
-plt.rcParams['axes.titlesize'] = 10
-plt.rcParams['axes.labelsize'] = 8
-plt.rcParams['xtick.labelsize'] = 7
-plt.rcParams['ytick.labelsize'] = 7
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from analytics import (compute_sanctions, incident_mask, monthly_summary_from_counts, quarterly_summary_from_counts,
+                       weekly_summary_from_counts)
+from artifacts import FULL_LOG_KEY, artifact_key, get_or_render
+from charts import get_chart_pool
+from cube import IncidentCube
+from exports import EXPORT_FORMATS, export_bytes, take_blocks
+from incidents import (INCIDENT_TO_CATEGORY, append_incidents, last_undoable_event, mark_sanctions_resolved,
+                       new_incident_row, read_learner_data, remove_incident, undo_last_event)
+from prerender import run_scheduler
+from risk import RISK_WINDOWS, RiskIndex
+from search import CommentIndex
+from spikes import SpikeIndex
+from shared_log import SharedLog
+from timeline import LearnerIndex
+from reports import REPORT_FORMATS, REPORT_PERIODS, period_range, previous_period_range
+from schools import load_schools
+from sync import log_error, push_incident_log
 
 # Set page config
 st.set_page_config(page_title="Insident Verslag", layout="wide")
@@ -286,454 +293,290 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Mapping of incidents to categories based on the Code of Conduct
-INCIDENT_TO_CATEGORY = {
-    # Category 1: Minor offenses
-    "Strooi van vullis": "1",
-    "Eet in klas": "1",
-    "Onnet voorkoms": "1",
-    "Ontwrigtende gedrag in die klas": "1",
-    "Wangedrag tydens samekoms": "1",
-    "Betreding van verbode area": "1",
-    # Category 2: Moderate offenses
-    "Dros": "2",
-    "Laatkom": "2",
-    "Plagiaat": "2",
-    "Baklei": "2",
-    "Rook": "2",
-    "Beskadiging van eiendom": "2",
-    "Bedreiging": "2",
-    # Category 3: Serious offenses
-    "Boelie": "3",
-    "Seksuele teistering": "3",
-    "Rassistiese opmerkings": "3",
-    "Dwelmverbruik": "3",
-    "Onder invloed van alkohol": "3",
-    "Afkyk in eksamen": "3",
-    # Category 4: Severe offenses
-    "Aanranding": "4",
-    "Diefstal": "4",
-    "Dwelmverkoop": "4",
-    "Gevaarlike wapens": "4",
-    "Pornografie": "4",
-    "Vervalsing": "4",
-    # Default for unmapped incidents (can be adjusted manually)
-    "Onbekend": "1"
+# Column labels for incident log tables; Incident_ID is internal and hidden
+INCIDENT_COLUMN_CONFIG = {
+    "Learner_Full_Name": st.column_config.TextColumn("Leerder Naam", width="medium"),
+    "Class": st.column_config.TextColumn("Klas", width="small"),
+    "Teacher": st.column_config.TextColumn("Onderwyser", width="medium"),
+    "Incident": st.column_config.TextColumn("Insident", width="medium"),
+    "Category": st.column_config.TextColumn("Kategorie", width="small"),
+    "Comment": st.column_config.TextColumn("Kommentaar", width="large"),
+    "Date": st.column_config.DateColumn("Datum", width="medium", format="YYYY-MM-DD"),
+    "Sanction_Resolved": st.column_config.CheckboxColumn("Sanksie Opgelos", width="small"),
+    "Incident_ID": None
 }
 
-# Load and preprocess learner data
-@st.cache_data
-def load_learner_data():
-    df = pd.read_csv("learner_list.csv")
-    df.columns = df.columns.str.strip()
-    df['Learner_Full_Name'] = df['Leerder van'].fillna('') + ' ' + df['Leerner se naam'].fillna('')
-    df['Learner_Full_Name'] = df['Learner_Full_Name'].str.strip()
-    df = df.rename(columns={
-        'klasgroep': 'Class',
-        'Opvoeder betrokke': 'Teacher',
-        'Wat het gebeur': 'Incident',
-        'Kategorie': 'Category',
-        'Kommentaar': 'Comment'
-    })
-    df['Learner_Full_Name'] = df['Learner_Full_Name'].replace('', 'Onbekend')
-    df['Class'] = df['Class'].fillna('Onbekend')
-    df['Teacher'] = df['Teacher'].fillna('Onbekend')
-    df['Incident'] = df['Incident'].fillna('Onbekend')
-    df['Category'] = pd.to_numeric(df['Category'], errors='coerce').fillna(1).astype(int).astype(str)
-    df['Comment'] = df['Comment'].fillna('Geen Kommentaar')
-    np.random.seed(42)
-    start_date = datetime(2024, 1, 1)
-    date_range = [start_date + timedelta(days=int(x)) for x in np.random.randint(0, 365, size=len(df))]
-    df['Date'] = pd.to_datetime(date_range).date
-    return df
-
-# Load or initialize incident log with Sanction_Resolved column
-@st.cache_data
-def load_incident_log():
-    try:
-        if os.path.exists("incident_log.csv") and os.path.getsize("incident_log.csv") > 0:
-            df = pd.read_csv("incident_log.csv")
-            if 'Learner_Name' in df.columns and 'Learner_Full_Name' not in df.columns:
-                df = df.rename(columns={'Learner_Name': 'Learner_Full_Name'})
-            df['Category'] = pd.to_numeric(df['Category'], errors='coerce').fillna(1).astype(int).astype(str)
-            df['Class'] = df['Class'].fillna('Onbekend').astype(str)
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce').dt.date
-            if 'Sanction_Resolved' not in df.columns:
-                df['Sanction_Resolved'] = False
-            df['Sanction_Resolved'] = df['Sanction_Resolved'].astype(bool)
-            return df
-        else:
-            return pd.DataFrame(columns=['Learner_Full_Name', 'Class', 'Teacher', 'Incident', 'Category', 'Comment', 'Date', 'Sanction_Resolved'])
-    except (FileNotFoundError, pd.errors.EmptyDataError):
-        return pd.DataFrame(columns=['Learner_Full_Name', 'Class', 'Teacher', 'Incident', 'Category', 'Comment', 'Date', 'Sanction_Resolved'])
-
-# Save incident to log and push to GitHub
-def save_incident(learner_full_name, class_, teacher, incident, category, comment):
-    incident_log = load_incident_log()
-    sa_tz = pytz.timezone('Africa/Johannesburg')
-    try:
-        category = str(int(float(category)))
-    except ValueError:
-        category = '1'
-    new_incident = pd.DataFrame({
-        'Learner_Full_Name': [learner_full_name],
-        'Class': [class_],
-        'Teacher': [teacher],
-        'Incident': [incident],
-        'Category': [category],
-        'Comment': [comment],
-        'Date': [datetime.now(sa_tz).date()],
-        'Sanction_Resolved': [False]
-    })
-    updated_log = pd.concat([incident_log, new_incident], ignore_index=True)
-    updated_log.to_csv("incident_log.csv", index=False)
-
-    try:
-        g = Github(st.secrets["GITHUB_TOKEN"])
-        repo = g.get_repo("arnoldtRealph/insident")
-        with open("incident_log.csv", "rb") as file:
-            content = file.read()
-        repo_path = "incident_log.csv"
-        try:
-            contents = repo.get_contents(repo_path, ref="master")
-            repo.update_file(
-                path=repo_path,
-                message="Updated incident_log.csv with new incident",
-                content=content,
-                sha=contents.sha,
-                branch="master"
-            )
-        except:
-            repo.create_file(
-                path=repo_path,
-                message="Created incident_log.csv with new incident",
-                content=content,
-                branch="master"
-            )
-    except Exception as e:
-        with open("error_log.txt", "a") as f:
-            f.write(f"GitHub push failed: {str(e)}\n")
-
-    return updated_log
-
-# Mark sanction as resolved and update GitHub
-def resolve_sanction(learner, category):
-    incident_log = load_incident_log()
-    mask = (incident_log['Learner_Full_Name'] == learner) & (incident_log['Category'] == category)
-    if mask.any():
-        incident_log.loc[mask, 'Sanction_Resolved'] = True
-        incident_log.to_csv("incident_log.csv", index=False)
-
-        try:
-            g = Github(st.secrets["GITHUB_TOKEN"])
-            repo = g.get_repo("arnoldtRealph/insident")
-            with open("incident_log.csv", "rb") as file:
-                content = file.read()
-            repo_path = "incident_log.csv"
-            try:
-                contents = repo.get_contents(repo_path, ref="master")
-                repo.update_file(
-                    path=repo_path,
-                    message="Updated incident_log.csv with resolved sanction",
-                    content=content,
-                    sha=contents.sha,
-                    branch="master"
-                )
-            except:
-                repo.create_file(
-                    path=repo_path,
-                    message="Created incident_log.csv with resolved sanction",
-                    content=content,
-                    branch="master"
-                )
-        except Exception as e:
-            with open("error_log.txt", "a") as f:
-                f.write(f"GitHub push failed: {str(e)}\n")
+# Column labels for the sanctions table
+SANCTION_COLUMN_CONFIG = {
+    "Learner": st.column_config.TextColumn("Leerder", width="medium"),
+    "Category": st.column_config.TextColumn("Kategorie", width="small"),
+    "Count": st.column_config.NumberColumn("Insidente", width="small"),
+    "Sanction": st.column_config.TextColumn("Sanksie", width="large")
+}
 
-    return incident_log
+# Sort orders for the sanctions table: (columns, ascending)
+SANCTION_SORTS = {
+    "Kategorie (ernstigste eerste)": (['Category', 'Count', 'Learner'], [False, False, True]),
+    "Aantal insidente": (['Count', 'Learner'], [False, True]),
+    "Leerder": (['Learner', 'Category'], [True, True])
+}
 
-# Clear a single incident and push to GitHub
-def clear_incident(index):
-    incident_log = load_incident_log()
-    if 0 <= index < len(incident_log):
-        updated_log = incident_log.drop(index).reset_index(drop=True)
-        updated_log.to_csv("incident_log.csv", index=False)
-
-        try:
-            g = Github(st.secrets["GITHUB_TOKEN"])
-            repo = g.get_repo("arnoldtRealph/insident")
-            with open("incident_log.csv", "rb") as file:
-                content = file.read()
-            repo_path = "incident_log.csv"
-            try:
-                contents = repo.get_contents(repo_path, ref="master")
-                repo.update_file(
-                    path=repo_path,
-                    message="Updated incident_log.csv after clearing incident",
-                    content=content,
-                    sha=contents.sha,
-                    branch="master"
-                )
-            except:
-                repo.create_file(
-                    path=repo_path,
-                    message="Created incident_log.csv after clearing incident",
-                    content=content,
-                    branch="master"
-                )
-        except Exception as e:
-            with open("error_log.txt", "a") as f:
-                f.write(f"GitHub push failed: {str(e)}\n")
-
-        return updated_log
-    return incident_log
-
-# Generate Word document
-def generate_word_report(df):
-    doc = Document()
-    doc.add_heading('Insident Verslag', 0)
-
-    doc.add_heading('Insident Besonderhede', level=1)
-    columns_to_include = ['Learner_Full_Name', 'Class', 'Teacher', 'Incident', 'Category', 'Comment', 'Date']
-    filtered_df = df[columns_to_include]
-    table = doc.add_table(rows=1, cols=len(columns_to_include))
-    table.style = 'Table Grid'
-    for i, col in enumerate(columns_to_include):
-        table.cell(0, i).text = {
-            'Learner_Full_Name': 'Leerder Naam',
-            'Class': 'Klas',
-            'Teacher': 'Onderwyser',
-            'Incident': 'Insident',
-            'Category': 'Kategorie',
-            'Comment': 'Kommentaar',
-            'Date': 'Datum'
-        }.get(col, col)
-    for _, row in filtered_df.iterrows():
-        cells = table.add_row().cells
-        for i, col in enumerate(columns_to_include):
-            if col == 'Date':
-                cells[i].text = row[col].strftime("%Y-%m-%d")
-            else:
-                cells[i].text = str(row[col])
+SANCTIONS_PER_PAGE = 25
 
-    doc.add_heading('Insident Analise', level=1)
-    
-    fig, ax = plt.subplots(figsize=(3, 2))
-    category_counts = df['Category'].value_counts().sort_index()
-    sns.barplot(x=category_counts.index, y=category_counts.values, ax=ax, palette='Blues')
-    ax.set_title('Insidente volgens Kategorie', fontsize=10)
-    ax.set_xlabel('Kategorie', fontsize=8)
-    ax.set_ylabel('Aantal', fontsize=8)
-    ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-    ax.tick_params(axis='both', labelsize=7)
-    plt.tight_layout()
-    img_stream = io.BytesIO()
-    plt.savefig(img_stream, format='png', dpi=80, bbox_inches='tight')
-    plt.close()
-    doc.add_picture(img_stream, width=Inches(3))
+# School registry, shared by every session in this process
+@st.cache_resource
+def get_schools():
+    return load_schools()
 
-    fig, ax = plt.subplots(figsize=(3, 2))
-    incident_counts = df['Incident'].value_counts().head(5)
-    sns.barplot(x=incident_counts.index, y=incident_counts.values, ax=ax, palette='Blues')
-    ax.set_title('Insidente volgens Tipe', fontsize=10)
-    ax.set_xlabel('Insident', fontsize=8)
-    ax.set_ylabel('Aantal', fontsize=8)
-    ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-    ax.tick_params(axis='x', rotation=30, labelsize=7)
-    plt.tight_layout()
-    img_stream = io.BytesIO()
-    plt.savefig(img_stream, format='png', dpi=80, bbox_inches='tight')
-    plt.close()
-    doc.add_picture(img_stream, width=Inches(3))
+# Single background worker for GitHub pushes, shared across schools so writes stay ordered
+@st.cache_resource
+def get_sync_pool():
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="github-sync")
 
-    fig, ax = plt.subplots(figsize=(3, 2))
-    teacher_counts = df['Teacher'].value_counts().head(5)
-    sns.barplot(x=teacher_counts.index, y=teacher_counts.values, ax=ax, palette='Blues')
-    ax.set_title('Insidente volgens Onderwyser', fontsize=10)
-    ax.set_xlabel('Onderwyser', fontsize=8)
-    ax.set_ylabel('Aantal', fontsize=8)
-    ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-    ax.tick_params(axis='x', rotation=30, labelsize=7)
-    plt.tight_layout()
-    img_stream = io.BytesIO()
-    plt.savefig(img_stream, format='png', dpi=80, bbox_inches='tight')
-    plt.close()
-    doc.add_picture(img_stream, width=Inches(3))
+# Read a secret, returning None when it is not configured
+def get_secret(name):
+    try:
+        return st.secrets[name]
+    except Exception:
+        return None
+
+# Push the school's incident log to its GitHub repository in the background
+def push_to_github(school, message):
+    if not school['github_repo']:
+        return
+    token = get_secret(school['github_token_secret'])
+    if token is None:
+        log_error(f"GitHub push failed ({school['key']}): {school['github_token_secret']} not configured")
+        return
+    get_sync_pool().submit(push_incident_log, token, school, message)
+
+# Resolve the school for this session from the URL (?skool=...) or the login form
+def select_school(schools):
+    key = st.query_params.get("skool", st.session_state.get("school_key"))
+    if key not in schools and len(schools) == 1:
+        key = next(iter(schools))
+    if key in schools:
+        if not schools[key]['passcode_secret'] or st.session_state.get("school_key") == key:
+            st.session_state.school_key = key
+            return schools[key]
+
+    keys = list(schools)
+    with st.form(key="school_login"):
+        st.markdown('<div class="input-label">Skool</div>', unsafe_allow_html=True)
+        chosen = st.selectbox("", options=keys, index=keys.index(key) if key in schools else 0,
+                              format_func=lambda k: schools[k]['name'], key="school_login_key")
+        st.markdown('<div class="input-label">Wagwoord</div>', unsafe_allow_html=True)
+        passcode = st.text_input("", type="password", key="school_login_passcode")
+        if st.form_submit_button("Teken In"):
+            secret = schools[chosen]['passcode_secret']
+            if not secret or passcode == get_secret(secret):
+                st.session_state.school_key = chosen
+                st.query_params["skool"] = chosen
+                st.rerun()
+            st.error("Verkeerde wagwoord.")
+    st.stop()
+
+# Background thread that pre-renders reports for closed periods, one per process.
+# Set INSIDENT_PRERENDER_INTERVAL=0 to disable it and run prerender.py from cron instead.
+@st.cache_resource
+def start_prerender_scheduler():
+    interval = int(os.environ.get("INSIDENT_PRERENDER_INTERVAL", "3600"))
+    if interval <= 0:
+        return None
+    thread = threading.Thread(
+        target=run_scheduler,
+        args=(list(get_schools().values()), interval),
+        name="prerender",
+        daemon=True
+    )
+    thread.start()
+    return thread
 
-    fig, ax = plt.subplots(figsize=(3, 2))
-    class_counts = df['Class'].value_counts().head(5)
-    sns.barplot(x=class_counts.index, y=class_counts.values, ax=ax, palette='Blues')
-    ax.set_title('Insidente volgens Klas', fontsize=10)
-    ax.set_xlabel('Klas', fontsize=8)
-    ax.set_ylabel('Aantal', fontsize=8)
-    ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-    ax.tick_params(axis='x', rotation=30, labelsize=7)
-    plt.tight_layout()
-    img_stream = io.BytesIO()
-    plt.savefig(img_stream, format='png', dpi=80, bbox_inches='tight')
-    plt.close()
-    doc.add_picture(img_stream, width=Inches(3))
+# Worker processes that draw the Word report charts, started with the app so they are
+# warm by the first report download
+@st.cache_resource
+def start_chart_pool():
+    return get_chart_pool()
 
-    fig, ax = plt.subplots(figsize=(3, 2))
-    category_counts.plot(kind='pie', ax=ax, autopct='%1.1f%%', colors=sns.color_palette('Blues'), textprops={'fontsize': 7})
-    ax.set_title('Insident Verspreiding', fontsize=10)
-    plt.tight_layout()
-    img_stream = io.BytesIO()
-    plt.savefig(img_stream, format='png', dpi=80, bbox_inches='tight')
-    plt.close()
-    doc.add_picture(img_stream, width=Inches(3))
-
-    doc.add_heading('Leerders met Herhalende Insidente', level=1)
-    incident_counts = df['Learner_Full_Name'].value_counts()
-    high_risk_learners = incident_counts[incident_counts > 2].index
-    high_risk_df = df[df['Learner_Full_Name'].isin(high_risk_learners)][columns_to_include]
-
-    if not high_risk_df.empty:
-        table = doc.add_table(rows=1, cols=len(columns_to_include))
-        table.style = 'Table Grid'
-        headers = ['Leerder Naam', 'Klas', 'Onderwyser', 'Insident', 'Kategorie', 'Kommentaar', 'Datum']
-        for i, header in enumerate(headers):
-            table.cell(0, i).text = header
-        for _, row in high_risk_df.iterrows():
-            cells = table.add_row().cells
-            for i, col in enumerate(columns_to_include):
-                if col == 'Date':
-                    cells[i].text = row[col].strftime("%Y-%m-%d")
-                else:
-                    cells[i].text = str(row[col])
-    else:
-        doc.add_paragraph("Geen leerders met herhalende insidente nie.")
-
-    doc_stream = io.BytesIO()
-    doc.save(doc_stream)
-    doc_stream.seek(0)
-    return doc_stream
-
-# Generate learner-specific Word report
-def generate_learner_report(df, learner_full_name, period, start_date, end_date):
-    doc = Document()
-    doc.add_heading(f'Insident Verslag vir {learner_full_name}', 0)
-    doc.add_paragraph(f'Tydperk: {period}')
-    doc.add_paragraph(f'Datum Reeks: {start_date.strftime("%Y-%m-%d")} tot {end_date.strftime("%Y-%m-%d")}')
-
-    doc.add_heading('Insident Besonderhede', level=1)
-    columns_to_include = ['Learner_Full_Name', 'Class', 'Teacher', 'Incident', 'Category', 'Comment', 'Date']
-    filtered_df = df[columns_to_include]
-    table = doc.add_table(rows=1, cols=len(columns_to_include))
-    table.style = 'Table Grid'
-    for i, col in enumerate(columns_to_include):
-        table.cell(0, i).text = {
-            'Learner_Full_Name': 'Leerder Naam',
-            'Class': 'Klas',
-            'Teacher': 'Onderwyser',
-            'Incident': 'Insident',
-            'Category': 'Kategorie',
-            'Comment': 'Kommentaar',
-            'Date': 'Datum'
-        }.get(col, col)
-    for _, row in filtered_df.iterrows():
-        cells = table.add_row().cells
-        for i, col in enumerate(columns_to_include):
-            if col == 'Date':
-                cells[i].text = row[col].strftime("%Y-%m-%d")
-            else:
-                cells[i].text = str(row[col])
-
-    if not df.empty:
-        doc.add_heading('Insident Analise', level=1)
-        fig, ax = plt.subplots(figsize=(3, 2))
-        category_counts = df['Category'].value_counts().sort_index()
-        sns.barplot(x=category_counts.index, y=category_counts.values, ax=ax, palette='Blues')
-        ax.set_title('Insidente volgens Kategorie', fontsize=10)
-        ax.set_xlabel('Kategorie', fontsize=8)
-        ax.set_ylabel('Aantal', fontsize=8)
-        ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-        ax.tick_params(axis='both', labelsize=7)
-        plt.tight_layout()
-        img_stream = io.BytesIO()
-        plt.savefig(img_stream, format='png', dpi=80, bbox_inches='tight')
-        plt.close()
-        doc.add_picture(img_stream, width=Inches(3))
+# Load and preprocess learner data
+@st.cache_data
+def load_learner_data(path):
+    return read_learner_data(path)
+
+# The school's incident log, held once per process and shared by every session.
+# A write by this process is folded into it in place; a write by another process
+# (e.g. ingest.py) is picked up with a single re-read on the next access.
+@st.cache_resource
+def get_shared_log(path):
+    return SharedLog(path)
+
+def current_incident_log(school):
+    return get_shared_log(school['incident_log']).snapshot()
+
+# Risk, comment, learner timeline, count cube and spike indexes for a school's log, shared by all sessions
+# in the process. They follow the shared log: rebuilt on a reload, updated in place on a write.
+@st.cache_resource
+def get_log_indexes(path):
+    indexes = {}
+
+    def follow(change):
+        if change['reloaded']:
+            incident_log = change['log']
+            indexes.update(risk=RiskIndex(incident_log), comments=CommentIndex(incident_log),
+                           learners=LearnerIndex(incident_log), cube=IncidentCube(incident_log),
+                           spikes=SpikeIndex(incident_log))
+            return
+        for index in (indexes['risk'], indexes['comments'], indexes['learners'], indexes['cube'], indexes['spikes']):
+            if change['added'] is not None:
+                index.add(change['added'])
+            if change['removed'] is not None:
+                index.remove(change['removed'])
+        if change['resolved'] is not None:
+            for learner, category in change['resolved']:
+                indexes['learners'].resolve(learner, category)
+
+    get_shared_log(path).subscribe(follow)
+    return indexes
+
+# Indexes matching the log on disk
+def log_indexes(school):
+    current_incident_log(school)
+    return get_log_indexes(school['incident_log'])
+
+# Seconds between checks for changes made by other sessions or processes; 0 disables them
+LOG_POLL_INTERVAL = int(os.environ.get("INSIDENT_LOG_POLL_INTERVAL", "10"))
+
+# Rerun this session when the shared log has moved on from the version it last rendered
+@st.fragment(run_every=LOG_POLL_INTERVAL or None)
+def watch_incident_log(school):
+    shared_log = get_shared_log(school['incident_log'])
+    shared_log.snapshot()
+    if st.session_state.get('incident_log_seq') != shared_log.seq:
+        st.rerun()
 
-    doc_stream = io.BytesIO()
-    doc.save(doc_stream)
-    doc_stream.seek(0)
-    return doc_stream
+# Save incident to log and push to GitHub
+def save_incident(school, learner_full_name, class_, teacher, incident, category, comment):
+    new_incident = new_incident_row(learner_full_name, class_, teacher, incident, category, comment)
+    write = append_incidents(school['incident_log'], new_incident)
+    get_shared_log(school['incident_log']).apply(write, added=new_incident)
+    push_to_github(school, "with new incident")
+    return current_incident_log(school)
+
+# Mark (learner, category) sanctions as resolved in one write and one GitHub push
+def resolve_sanctions(school, sanctions):
+    write = mark_sanctions_resolved(school['incident_log'], sanctions)
+    if write is not None:
+        get_shared_log(school['incident_log']).apply(write, resolved=sanctions)
+        push_to_github(school, f"with {len(sanctions)} resolved sanction(s)")
+    return current_incident_log(school)
+
+# The full-log report as bytes, from the artifact store unless the log changed since it was rendered
+def full_log_report(school, incident_log, cube, report_format):
+    report_path, _ = get_or_render(
+        school, FULL_LOG_KEY, incident_log,
+        lambda: report_format['full'](incident_log, cube.chart_counts()),
+        report_format['extension']
+    )
+    with open(report_path, "rb") as report_file:
+        return report_file.read()
 
-# Load data
-learner_df = load_learner_data()
-incident_log = load_incident_log()
+# Clear a single incident and push to GitHub
+def clear_incident(school, incident_id):
+    removed, write = remove_incident(school['incident_log'], incident_id)
+    if removed is not None:
+        get_shared_log(school['incident_log']).apply(write, removed=removed)
+        push_to_github(school, "after clearing incident")
+    return current_incident_log(school)
+
+# Undo the latest save, resolve or delete and push to GitHub; the shared log picks the
+# change up with a re-read, like a write by another process
+def undo_change(school):
+    undone = undo_last_event(school['incident_log'])
+    if undone is not None:
+        push_to_github(school, "after undoing a change")
+    return undone
+
+# Short Afrikaans description of an event for the undo button
+def describe_event(event):
+    if event['event'] in ('resolved', 'reopened'):
+        action = "Sanksies opgelos" if event['event'] == 'resolved' else "Sanksies heropen"
+        # Events recorded before batch resolving name one sanction as learner and category
+        sanctions = event.get('sanctions') or [(event.get('learner', ''), event.get('category', ''))]
+        names = ", ".join(f"{learner} (Kategorie {category})" for learner, category in sanctions[:3])
+        more = len(sanctions) - 3
+        return f"{action}: {names}" + (f" en {more} meer" if more > 0 else "")
+    names = ", ".join(row['Learner_Full_Name'] for row in event['rows'][:3])
+    action = {'created': "Insident gestoor", 'deleted': "Insident verwyder", 'restored': "Insident herstel"}[event['event']]
+    return f"{action}: {names}"
+
+# Select school and load its data
+school = select_school(get_schools())
+start_prerender_scheduler()
+start_chart_pool()
+learner_df = load_learner_data(school['learner_list'])
+incident_log = current_incident_log(school)
+st.session_state.incident_log_seq = get_shared_log(school['incident_log']).seq
+if LOG_POLL_INTERVAL:
+    watch_incident_log(school)
 
 # Main content
 with st.container():
-    st.title("HOËRSKOOL SAUL DAMON")
+    st.title(school['name'])
     st.subheader("INSIDENT VERSLAG")
 
 # Compute sanctions
 if not incident_log.empty:
-    tally_df = incident_log.pivot_table(
-        index='Learner_Full_Name',
-        columns='Category',
-        values='Incident',
-        aggfunc='count',
-        fill_value=0
-    )
-    for cat in ['1', '2', '3', '4']:
-        if cat not in tally_df.columns:
-            tally_df[cat] = 0
-    tally_df = tally_df[['1', '2', '3', '4']].reset_index()
-
-    sanctions = []
-    for _, row in tally_df.iterrows():
-        learner = row['Learner_Full_Name']
-        for cat in ['1', '2', '3', '4']:
-            count = int(row[cat])
-            if count > 0:
-                if cat == '1' and count > 10:
-                    sanction = 'Ouers moet afspraak maak met Mnr. Zealand.'
-                elif cat == '2' and count > 5:
-                    sanction = 'Ouers moet afspraak maak met Mnr. Zealand.'
-                elif cat == '3' and count > 2:
-                    sanction = 'Ouers moet afspraak maak met Mnr. Zealand.'
-                elif cat == '4' and count >= 1:
-                    sanction = 'Leerder moet geskors word.'
-                else:
-                    continue
-                mask = (incident_log['Learner_Full_Name'] == learner) & (incident_log['Category'] == cat)
-                if not incident_log[mask]['Sanction_Resolved'].all():
-                    sanctions.append({
-                        'Learner': learner,
-                        'Category': cat,
-                        'Count': count,
-                        'Sanction': sanction
-                    })
-
-    sanctions_df = pd.DataFrame(sanctions)
+    sanctions_df = compute_sanctions(incident_log, school)
 
     with st.container():
         st.markdown('<div class="notification-container">', unsafe_allow_html=True)
-        any_notifications = False
-        for _, row in sanctions_df.iterrows():
-            learner = row['Learner']
-            category = row['Category']
-            any_notifications = True
+        if not sanctions_df.empty:
             st.markdown(
                 f"""
                 <div style='background-color: #ffe6e6; padding: 10px; border-radius: 6px; border: 1px solid #cc0000;'>
-                    <h4 style='color: #cc0000; margin: 0; font-size: 1rem;'>SANKSIEMELDING</h4>
+                    <h4 style='color: #cc0000; margin: 0; font-size: 1rem;'>SANKSIEMELDINGS</h4>
                     <p style='color: #333; margin: 3px 0; font-size: 0.85rem;'>
-                        Leerder <strong>{row['Learner']}</strong>: {row['Count']} Kategorie {row['Category']} insidente. 
-                        Sanksie: {row['Sanction']}
+                        {len(sanctions_df)} uitstaande sanksies. Kies rye in die tabel en klik "Los Gekose Op".
                     </p>
                 </div>
                 """,
                 unsafe_allow_html=True
             )
-            if st.button("Opgelos", key=f"sanction_resolve_{learner}_{category}"):
-                incident_log = resolve_sanction(learner, category)
-                st.success("Sanksie permanent opgelos!")
+            col1, col2 = st.columns([2, 1])
+            with col1:
+                sanction_sort = st.selectbox("Sorteer volgens", options=list(SANCTION_SORTS), key="sanction_sort")
+            sort_columns, ascending = SANCTION_SORTS[sanction_sort]
+            sanctions_df = sanctions_df.sort_values(sort_columns, ascending=ascending, kind='stable')
+            sanction_pages = (len(sanctions_df) + SANCTIONS_PER_PAGE - 1) // SANCTIONS_PER_PAGE
+            if st.session_state.get('sanction_page', 1) > sanction_pages:
+                st.session_state.sanction_page = sanction_pages
+            with col2:
+                sanction_page = st.selectbox("Bladsy", options=list(range(1, sanction_pages + 1)), key="sanction_page")
+            page_df = sanctions_df.iloc[(sanction_page - 1) * SANCTIONS_PER_PAGE:sanction_page * SANCTIONS_PER_PAGE]
+            # Keyed on the sanctions shown, so a selection never points at rows of another page or
+            # at rows that moved after sanctions were resolved, but survives other changes to the log
+            page_key = hashlib.sha1(repr(list(zip(page_df['Learner'], page_df['Category']))).encode("utf-8")).hexdigest()
+            selection = st.dataframe(
+                page_df,
+                hide_index=True,
+                use_container_width=True,
+                column_config=SANCTION_COLUMN_CONFIG,
+                on_select="rerun",
+                selection_mode="multi-row",
+                key=f"sanctions_table_{page_key}"
+            )
+            selected_df = page_df.iloc[selection.selection.rows]
+            col1, col2 = st.columns(2)
+            with col1:
+                resolve_selected = st.button(f"Los Gekose Op ({len(selected_df)})", disabled=selected_df.empty)
+            with col2:
+                resolve_page = st.button(f"Los Hele Bladsy Op ({len(page_df)})")
+            if resolve_selected or resolve_page:
+                resolved_df = selected_df if resolve_selected else page_df
+                incident_log = resolve_sanctions(school, list(zip(resolved_df['Learner'], resolved_df['Category'])))
+                st.success(f"{len(resolved_df)} sanksies permanent opgelos!")
                 st.rerun()
-        if not any_notifications:
+        else:
             st.markdown(
                 """
                 <div style='background-color: #e6f3e6; padding: 10px; border-radius: 6px; border: 1px solid #28b463;'>
@@ -742,6 +585,22 @@ if not incident_log.empty:
                 """,
                 unsafe_allow_html=True
             )
+
+        # Classes and teachers with far more incidents today than on a usual school day
+        spikes_df = log_indexes(school)['spikes'].flags(datetime.now(pytz.timezone('Africa/Johannesburg')).date())
+        for _, row in spikes_df.iterrows():
+            st.markdown(
+                f"""
+                <div style='background-color: #fff4e0; padding: 10px; border-radius: 6px; border: 1px solid #e67e22;'>
+                    <h4 style='color: #e67e22; margin: 0; font-size: 1rem;'>PIEKMELDING</h4>
+                    <p style='color: #333; margin: 3px 0; font-size: 0.85rem;'>
+                        {row['Group']} <strong>{row['Value']}</strong>: {row['Count']} insidente vandag,
+                        teenoor gewoonlik {row['Baseline']} per skooldag.
+                    </p>
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
         st.markdown('</div>', unsafe_allow_html=True)
 
 # Report new incident
@@ -777,9 +636,7 @@ with st.container():
     
     if st.button("Stoor Insident"):
         if learner_full_name != 'Kies' and class_ != 'Kies' and teacher != 'Kies' and incident != 'Kies' and category != 'Kies' and comment:
-            incident_log = save_incident(learner_full_name, class_, teacher, incident, category, comment)
-            st.cache_data.clear()
-            incident_log = load_incident_log()
+            incident_log = save_incident(school, learner_full_name, class_, teacher, incident, category, comment)
             st.success("Insident suksesvol gestoor!")
             st.rerun()
         else:
@@ -789,45 +646,43 @@ with st.container():
 st.header("Genereer Leerder Verslag")
 with st.container():
     st.markdown('<div class="input-label">Kies Leerder vir Verslag</div>', unsafe_allow_html=True)
-    learner_report_name = st.selectbox("", options=['Kies'] + sorted(incident_log['Learner_Full_Name'].unique()) if not incident_log.empty else ['Kies'], key="learner_report_name")
+    learner_report_name = st.selectbox("", options=['Kies'] + log_indexes(school)['learners'].learners(), key="learner_report_name")
     
     st.markdown('<div class="input-label">Kies Tydperk</div>', unsafe_allow_html=True)
-    report_period = st.selectbox("", options=['Daagliks', 'Weekliks', 'Maandelik', 'Kwartaalliks'], key="report_period")
+    report_period = st.selectbox("", options=REPORT_PERIODS, key="report_period")
+    previous_period = st.checkbox("Vorige (afgeslote) tydperk", key="report_previous_period")
+    learner_report_format = REPORT_FORMATS[st.radio("Formaat", options=list(REPORT_FORMATS), horizontal=True,
+                                                    key="learner_report_format")]
 
     sa_tz = pytz.timezone('Africa/Johannesburg')
     today = datetime.now(sa_tz).date()
 
-    if report_period == 'Daagliks':
-        start_date = today
-        end_date = today
-    elif report_period == 'Weekliks':
-        start_date = today - timedelta(days=today.weekday())
-        end_date = start_date + timedelta(days=6)
-    elif report_period == 'Maandelik':
-        start_date = today.replace(day=1)
-        end_date = (start_date + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+    if previous_period:
+        start_date, end_date = previous_period_range(report_period, today)
     else:
-        quarter_start_month = ((today.month - 1) // 3) * 3 + 1
-        start_date = today.replace(month=quarter_start_month, day=1)
-        end_date = (start_date + timedelta(days=92)).replace(day=1) - timedelta(days=1)
+        start_date, end_date = period_range(report_period, today)
 
     st.write(f"Verslag Datum Reeks: {start_date.strftime('%Y-%m-%d')} tot {end_date.strftime('%Y-%m-%d')}")
 
     if st.button("Genereer Leerder Verslag"):
         if learner_report_name != 'Kies':
-            learner_incidents = incident_log[
-                (incident_log['Learner_Full_Name'] == learner_report_name) &
-                (incident_log['Date'] >= start_date) &
-                (incident_log['Date'] <= end_date)
-            ]
+            learner_incidents = log_indexes(school)['learners'].incidents(learner_report_name, start_date, end_date)
             if not learner_incidents.empty:
-                report_stream = generate_learner_report(learner_incidents, learner_report_name, report_period, start_date, end_date)
+                report_path, _ = get_or_render(
+                    school,
+                    artifact_key(report_period, start_date, end_date, learner_report_name),
+                    learner_incidents,
+                    lambda: learner_report_format['learner'](learner_incidents, learner_report_name, report_period, start_date, end_date),
+                    learner_report_format['extension']
+                )
                 st.success(f"Verslag vir {learner_report_name} suksesvol gegenereer!")
+                with open(report_path, "rb") as report_file:
+                    report_bytes = report_file.read()
                 st.download_button(
                     label="Laai Leerder Verslag af",
-                    data=report_stream,
-                    file_name=f"insident_verslag_{learner_report_name}_{report_period.lower()}.docx",
-                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                    data=report_bytes,
+                    file_name=f"insident_verslag_{learner_report_name}_{report_period.lower()}.{learner_report_format['extension']}",
+                    mime=learner_report_format['mime']
                 )
             else:
                 st.error(f"Geen insidente gevind vir {learner_report_name} in die geselekteerde tydperk.")
@@ -836,6 +691,28 @@ with st.container():
 
 st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
 
+# Learner history: one learner's full timeline from the per-learner index
+st.subheader("Leerder Geskiedenis")
+learner_index = log_indexes(school)['learners']
+st.markdown('<div class="input-label">Kies Leerder</div>', unsafe_allow_html=True)
+history_learner = st.selectbox("", options=['Kies'] + learner_index.learners(), key="history_learner")
+if history_learner != 'Kies':
+    history_df = learner_index.incidents(history_learner)
+    if not history_df.empty:
+        category_totals = history_df['Category'].value_counts().sort_index()
+        st.write(f"{len(history_df)} insidente sedert {history_df['Date'].dropna().min()}: "
+                 + ", ".join(f"Kategorie {cat}: {count}" for cat, count in category_totals.items()))
+        st.dataframe(
+            history_df.iloc[::-1].reset_index(drop=True),
+            height=300,
+            use_container_width=True,
+            column_config=INCIDENT_COLUMN_CONFIG
+        )
+    else:
+        st.info(f"Geen insidente vir {history_learner} nie.")
+
+st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
+
 # Incident log
 st.subheader("Insident Log")
 if not incident_log.empty:
@@ -869,31 +746,26 @@ if not incident_log.empty:
     start_idx = (st.session_state.incident_log_page - 1) * rows_per_page
     end_idx = min(start_idx + rows_per_page, total_rows)
 
-    display_df = incident_log.iloc[start_idx:end_idx].copy()
-    display_df.index = range(start_idx + 1, end_idx + 1)  # Continuous 1-based index
+    display_df = incident_log.iloc[start_idx:end_idx].set_axis(range(start_idx + 1, end_idx + 1))  # Continuous 1-based index
 
     st.dataframe(
         display_df,
         height=400,
         use_container_width=True,
-        column_config={
-            "Learner_Full_Name": st.column_config.TextColumn("Leerder Naam", width="medium"),
-            "Class": st.column_config.TextColumn("Klas", width="small"),
-            "Teacher": st.column_config.TextColumn("Onderwyser", width="medium"),
-            "Incident": st.column_config.TextColumn("Insident", width="medium"),
-            "Category": st.column_config.TextColumn("Kategorie", width="small"),
-            "Comment": st.column_config.TextColumn("Kommentaar", width="large"),
-            "Date": st.column_config.DateColumn("Datum", width="medium", format="YYYY-MM-DD"),
-            "Sanction_Resolved": st.column_config.CheckboxColumn("Sanksie Opgelos", width="small")
-        }
+        column_config=INCIDENT_COLUMN_CONFIG
     )
     st.write(f"Wys {start_idx + 1} tot {end_idx} van {total_rows} insidente")
 
+    report_format_name = st.radio("Verslag Formaat", options=list(REPORT_FORMATS), horizontal=True, key="log_report_format")
+    report_format = REPORT_FORMATS[report_format_name]
+    # The stored report is looked up (which hashes the whole log) or rendered only when the
+    # button is clicked, not on every rerun
+    report_cube = log_indexes(school)['cube']
     st.download_button(
-        label="Laai Verslag af as Word",
-        data=generate_word_report(incident_log),
-        file_name="insident_verslag.docx",
-        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        label=f"Laai Verslag af as {report_format_name}",
+        data=lambda: full_log_report(school, incident_log, report_cube, report_format),
+        file_name=f"insident_verslag.{report_format['extension']}",
+        mime=report_format['mime']
     )
 
     st.write("Verwyder 'n Insident")
@@ -904,9 +776,7 @@ if not incident_log.empty:
         if 1 <= selected_display_index <= total_rows:
             global_index = selected_display_index - 1  # Convert 1-based to 0-based for internal use
             if 0 <= global_index < len(incident_log):
-                incident_log = clear_incident(global_index)
-                st.cache_data.clear()
-                incident_log = load_incident_log()  # Reload to reflect changes
+                incident_log = clear_incident(school, incident_log['Incident_ID'].iloc[global_index])
                 st.success(f"Insident {selected_display_index} suksesvol verwyder!")
                 total_rows = len(incident_log)
                 total_pages = (total_rows + rows_per_page - 1) // rows_per_page
@@ -923,16 +793,55 @@ if not incident_log.empty:
 else:
     st.write("Geen insidente in die log nie.")
 
+last_event = last_undoable_event(school['incident_log'])
+if last_event is not None:
+    st.write(f"Laaste verandering ({last_event['at'][:16].replace('T', ' ')}): {describe_event(last_event)}")
+    if st.button("Ontdoen Laaste Verandering"):
+        undo_change(school)
+        st.success("Verandering ontdoen!")
+        st.rerun()
+
+# Comment search
+st.subheader("Soek in Kommentaar")
+search_query = st.text_input("Soek", placeholder="bv. baklei, rook* of laat klas", key="comment_search")
+if search_query:
+    results_per_page = 10
+    if st.session_state.get("comment_search_last") != search_query:
+        st.session_state.comment_search_last = search_query
+        st.session_state.comment_search_page = 1
+    search_page = st.session_state.get("comment_search_page", 1)
+    total_matches, match_ids = log_indexes(school)['comments'].search(
+        search_query, offset=(search_page - 1) * results_per_page, limit=results_per_page
+    )
+    if total_matches:
+        search_pages = (total_matches + results_per_page - 1) // results_per_page
+        matches_df = incident_log.set_index('Incident_ID').reindex(match_ids).dropna(how='all')
+        st.dataframe(matches_df, use_container_width=True, hide_index=True, column_config=INCIDENT_COLUMN_CONFIG)
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if st.button("Vorige", key="comment_search_prev", disabled=search_page <= 1):
+                st.session_state.comment_search_page = search_page - 1
+                st.rerun()
+        with col2:
+            st.write(f"Bladsy {search_page} van {search_pages} ({total_matches} insidente)")
+        with col3:
+            if st.button("Volgende", key="comment_search_next", disabled=search_page >= search_pages):
+                st.session_state.comment_search_page = search_page + 1
+                st.rerun()
+    else:
+        st.info("Geen insidente gevind nie.")
+
 # Today's incidents
 st.subheader("Vandag se Insidente")
 today = datetime.now(pytz.timezone('Africa/Johannesburg')).date()
-today_incidents = incident_log[incident_log['Date'] == today]
-if not today_incidents.empty:
-    st.write(f"Totale Insidente Vandag: {len(today_incidents)}")
+cube = log_indexes(school)['cube']
+today_total = cube.total(start_date=today, end_date=today)
+if today_total:
+    st.write(f"Totale Insidente Vandag: {today_total}")
 
     st.write("Insidente volgens Kategorie")
     fig, ax = plt.subplots(figsize=(3, 2))
-    category_counts = today_incidents['Category'].value_counts().sort_index()
+    category_counts = cube.counts('Category', start_date=today, end_date=today)
     sns.barplot(x=category_counts.index, y=category_counts.values, ax=ax, palette='Blues')
     ax.set_title('Insidente volgens Kategorie (Vandag)', fontsize=10)
     ax.set_xlabel('Kategorie', fontsize=8)
@@ -945,7 +854,7 @@ if not today_incidents.empty:
 
     st.write("Insidente volgens Tipe")
     fig, ax = plt.subplots(figsize=(6, 3))
-    incident_counts = today_incidents['Incident'].value_counts().head(5)
+    incident_counts = cube.top('Incident', 5, start_date=today, end_date=today)
     sns.barplot(x=incident_counts.index, y=incident_counts.values, ax=ax, palette='Blues')
     ax.set_title('Insidente volgens Tipe (Vandag)', fontsize=10)
     ax.set_xlabel('Insident', fontsize=8)
@@ -958,7 +867,7 @@ if not today_incidents.empty:
 
     st.write("Insidente volgens Onderwyser")
     fig, ax = plt.subplots(figsize=(3, 2))
-    teacher_counts = today_incidents['Teacher'].value_counts().head(5)
+    teacher_counts = cube.top('Teacher', 5, start_date=today, end_date=today)
     sns.barplot(x=teacher_counts.index, y=teacher_counts.values, ax=ax, palette='Blues')
     ax.set_title('Insidente volgens Onderwyser (Vandag)', fontsize=10)
     ax.set_xlabel('Onderwyser', fontsize=8)
@@ -971,7 +880,7 @@ if not today_incidents.empty:
 
     st.write("Insidente volgens Klas")
     fig, ax = plt.subplots(figsize=(3, 2))
-    class_counts = today_incidents['Class'].value_counts().head(5)
+    class_counts = cube.top('Class', 5, start_date=today, end_date=today)
     sns.barplot(x=class_counts.index, y=class_counts.values, ax=ax, palette='Blues')
     ax.set_title('Insidente volgens Klas (Vandag)', fontsize=10)
     ax.set_xlabel('Klas', fontsize=8)
@@ -990,64 +899,58 @@ tab1, tab2, tab3, tab4 = st.tabs(["Gefiltreerde Data", "Weeklikse Opsomming", "M
 with tab1:
     st.subheader("Gefiltreerde Data")
     st.markdown('<div class="input-label">Filter Leerder Naam</div>', unsafe_allow_html=True)
-    learner_options = ['Alle'] + sorted(incident_log['Learner_Full_Name'].unique()) if not incident_log.empty else ['Alle']
+    # Options come from the shared indexes, not from scanning the log's columns
+    learner_options = ['Alle'] + log_indexes(school)['learners'].learners()
     filter_learner = st.selectbox("", options=learner_options, key="filter_learner")
     
     st.markdown('<div class="input-label">Filter Klas</div>', unsafe_allow_html=True)
-    class_options = sorted(incident_log['Class'].fillna('Onbekend').astype(str).unique()) if not incident_log.empty else []
+    class_options = list(cube.counts('Class').index)
     filter_class = st.selectbox("", options=['Alle'] + class_options, key="filter_class")
     
     st.markdown('<div class="input-label">Filter Onderwyser</div>', unsafe_allow_html=True)
-    teacher_options = ['Alle'] + sorted(incident_log['Teacher'].unique()) if not incident_log.empty else ['Alle']
+    teacher_options = ['Alle'] + list(cube.counts('Teacher').index)
     filter_teacher = st.selectbox("", options=teacher_options, key="filter_teacher")
     
     st.markdown('<div class="input-label">Filter Insident</div>', unsafe_allow_html=True)
-    incident_options = ['Alle'] + sorted(incident_log['Incident'].unique()) if not incident_log.empty else ['Alle']
+    incident_options = ['Alle'] + list(cube.counts('Incident').index)
     filter_incident = st.selectbox("", options=incident_options, key="filter_incident")
     
     st.markdown('<div class="input-label">Filter Kategorie</div>', unsafe_allow_html=True)
-    category_options = ['Alle'] + sorted(incident_log['Category'].unique(), key=lambda x: int(x)) if not incident_log.empty else ['Alle']
+    category_options = ['Alle'] + sorted(cube.counts('Category').index, key=lambda x: int(x))
     filter_category = st.selectbox("", options=category_options, key="filter_category")
     
-    filtered_df = incident_log.copy()
-    if filter_learner != 'Alle':
-        filtered_df = filtered_df[filtered_df['Learner_Full_Name'] == filter_learner]
-    if filter_class != 'Alle':
-        filtered_df = filtered_df[filtered_df['Class'] == filter_class]
-    if filter_teacher != 'Alle':
-        filtered_df = filtered_df[filtered_df['Teacher'] == filter_teacher]
-    if filter_incident != 'Alle':
-        filtered_df = filtered_df[filtered_df['Incident'] == filter_incident]
-    if filter_category != 'Alle':
-        filtered_df = filtered_df[filtered_df['Category'] == filter_category]
+    # Only the rows on screen are taken out of the shared log
+    filtered_positions = np.flatnonzero(incident_mask(
+        incident_log,
+        *(None if value == 'Alle' else value
+          for value in (filter_learner, filter_class, filter_teacher, filter_incident, filter_category))
+    ))
     st.dataframe(
-        filtered_df.head(10),
+        incident_log.take(filtered_positions[:10]),
         use_container_width=True,
         height=300,
-        column_config={
-            "Learner_Full_Name": st.column_config.TextColumn("Leerder Naam", width="medium"),
-            "Class": st.column_config.TextColumn("Klas", width="small"),
-            "Teacher": st.column_config.TextColumn("Onderwyser", width="medium"),
-            "Incident": st.column_config.TextColumn("Insident", width="medium"),
-            "Category": st.column_config.TextColumn("Kategorie", width="small"),
-            "Comment": st.column_config.TextColumn("Kommentaar", width="large"),
-            "Date": st.column_config.DateColumn("Datum", width="medium", format="YYYY-MM-DD"),
-            "Sanction_Resolved": st.column_config.CheckboxColumn("Sanksie Opgelos", width="small")
-        }
+        column_config=INCIDENT_COLUMN_CONFIG
+    )
+    st.write(f"Totale Insidente: {len(filtered_positions)}")
+
+    # The export is only written when the button is clicked, block by block from the
+    # filter positions, without building the filtered rows as one DataFrame
+    export_format_name = st.radio("Uitvoer Formaat", options=list(EXPORT_FORMATS), horizontal=True, key="export_format")
+    export_format = EXPORT_FORMATS[export_format_name]
+    st.download_button(
+        label=f"Laai Gefiltreerde Data af as {export_format_name}",
+        data=lambda: export_bytes(take_blocks(incident_log, filtered_positions), export_format_name),
+        file_name=f"gefiltreerde_insidente.{export_format['extension']}",
+        mime=export_format['mime'],
+        disabled=len(filtered_positions) == 0
     )
-    st.write(f"Totale Insidente: {len(filtered_df)}")
 
 with tab2:
     st.subheader("Weeklikse Opsomming")
     if not incident_log.empty:
-        incident_log_dt = incident_log.copy()
-        incident_log_dt['Date'] = pd.to_datetime(incident_log_dt['Date'])
-        weekly_summary = incident_log_dt.groupby([pd.Grouper(key='Date', freq='W-MON'), 'Category']).size().unstack(fill_value=0)
-        weekly_summary.index = weekly_summary.index.strftime('%Y-%m-%d')
-        weekly_summary['Totaal'] = weekly_summary.sum(axis=1)
-        weekly_summary = weekly_summary.reset_index().rename(columns={'Date': 'Week Begin (Maandag)'})
+        weekly_df = weekly_summary_from_counts(cube.period_counts(['week']))
         st.dataframe(
-            weekly_summary.head(10),
+            weekly_df.head(10),
             use_container_width=True,
             height=300,
             column_config={
@@ -1056,11 +959,11 @@ with tab2:
             }
         )
         fig, ax = plt.subplots(figsize=(6, 3))
-        weekly_summary.set_index('Week Begin (Maandag)')[[col for col in weekly_summary.columns[1:-1]]].plot(
+        weekly_df.set_index('Week Begin (Maandag)')[[col for col in weekly_df.columns[1:-1]]].plot(
             kind='bar', 
             stacked=True, 
             ax=ax, 
-            color=sns.color_palette('tab10', n_colors=len(weekly_summary.columns[1:-1]))
+            color=sns.color_palette('tab10', n_colors=len(weekly_df.columns[1:-1]))
         )
         ax.set_title('Weeklikse Insidente', fontsize=10)
         ax.set_xlabel('Week Begin', fontsize=8)
@@ -1077,17 +980,14 @@ with tab2:
 with tab3:
     st.subheader("Maandelikse Opsomming")
     if not incident_log.empty:
-        incident_log_dt = incident_log.copy()
-        incident_log_dt['Date'] = pd.to_datetime(incident_log_dt['Date'])
-        monthly_summary = incident_log_dt.groupby([pd.Grouper(key='Date', freq='M'), 'Category']).size().unstack(fill_value=0)
-        monthly_summary.index = monthly_summary.index.strftime('%Y-%m')
-        st.dataframe(monthly_summary.head(10), use_container_width=True, height=300)
+        monthly_df = monthly_summary_from_counts(cube.period_counts(['month']))
+        st.dataframe(monthly_df.head(10), use_container_width=True, height=300)
         fig, ax = plt.subplots(figsize=(6, 3))
-        monthly_summary.plot(
+        monthly_df.plot(
             kind='bar', 
             stacked=True, 
             ax=ax, 
-            color=sns.color_palette('tab10', n_colors=len(monthly_summary.columns))
+            color=sns.color_palette('tab10', n_colors=len(monthly_df.columns))
         )
         ax.set_title('Maandelikse Insidente', fontsize=10)
         ax.set_xlabel('Maand', fontsize=8)
@@ -1104,19 +1004,14 @@ with tab3:
 with tab4:
     st.subheader("Kwartaallikse Opsomming")
     if not incident_log.empty:
-        incident_log_dt = incident_log.copy()
-        incident_log_dt['Date'] = pd.to_datetime(incident_log_dt['Date'])
-        quarterly_summary = incident_log_dt.groupby([pd.Grouper(key='Date', freq='Q'), 'Category']).size().unstack(fill_value=0)
-        quarterly_summary.index = quarterly_summary.index.map(
-            lambda x: f"{x.year}-Q{(x.month-1)//3 + 1}"
-        )
-        st.dataframe(quarterly_summary.head(10), use_container_width=True, height=300)
+        quarterly_df = quarterly_summary_from_counts(cube.period_counts(['quarter']))
+        st.dataframe(quarterly_df.head(10), use_container_width=True, height=300)
         fig, ax = plt.subplots(figsize=(6, 3))
-        quarterly_summary.plot(
+        quarterly_df.plot(
             kind='bar', 
             stacked=True, 
             ax=ax, 
-            color=sns.color_palette('tab10', n_colors=len(quarterly_summary.columns))
+            color=sns.color_palette('tab10', n_colors=len(quarterly_df.columns))
         )
         ax.set_title('Kwartaallikse Insidente', fontsize=10)
         ax.set_xlabel('Kwartaal', fontsize=8)
@@ -1132,34 +1027,23 @@ with tab4:
 
 # High-risk learners
 st.subheader("Leerders met Herhalende Insidente")
-incident_counts = incident_log['Learner_Full_Name'].value_counts()
-high_risk_learners = incident_counts[incident_counts > 2].index
-high_risk_df = incident_log[incident_log['Learner_Full_Name'].isin(high_risk_learners)]
-
-if not high_risk_df.empty:
-    st.markdown("Leerders met meer as twee insidente:")
-    display_df = high_risk_df.rename(columns={
-        'Learner_Full_Name': 'Leerder Naam',
-        'Class': 'Klas',
-        'Teacher': 'Onderwyser',
-        'Incident': 'Insident',
-        'Category': 'Kategorie',
-        'Comment': 'Kommentaar',
-        'Date': 'Datum',
-        'Sanction_Resolved': 'Sanksie Opgelos'
-    })
+risk_top_n = st.selectbox("Wys top", options=[10, 25, 50], key="risk_top_n")
+risk_df = log_indexes(school)['risk'].top(risk_top_n, datetime.now(pytz.timezone('Africa/Johannesburg')).date())
+
+if not risk_df.empty:
+    st.markdown("Leerders met die hoogste risikotelling (onlangse en ernstiger insidente tel swaarder):")
     st.dataframe(
-        display_df,
+        risk_df,
         use_container_width=True,
+        hide_index=True,
         column_config={
-            "Leerder Naam": st.column_config.TextColumn("Leerder Naam", width="medium"),
-            "Klas": st.column_config.TextColumn("Klas", width="small"),
-            "Onderwyser": st.column_config.TextColumn("Onderwyser", width="medium"),
-            "Insident": st.column_config.TextColumn("Insident", width="medium"),
-            "Kategorie": st.column_config.TextColumn("Kategorie", width="small"),
-            "Kommentaar": st.column_config.TextColumn("Kommentaar", width="large"),
-            "Datum": st.column_config.DateColumn("Datum", width="medium", format="YYYY-MM-DD"),
-            "Sanksie Opgelos": st.column_config.CheckboxColumn("Sanksie Opgelos", width="small")
+            "Learner_Full_Name": st.column_config.TextColumn("Leerder Naam", width="medium"),
+            "Class": st.column_config.TextColumn("Klas", width="small"),
+            "Risk_Score": st.column_config.NumberColumn("Risikotelling", width="small", format="%.1f"),
+            **{
+                f"Incidents_{days}": st.column_config.NumberColumn(f"Insidente ({days} dae)", width="small")
+                for days, _ in RISK_WINDOWS
+            }
         }
     )
 else:
@@ -0,0 +1,163 @@
+import io
+from datetime import timedelta
+from docx import Document
+from docx.shared import Inches
+from analytics import CHART_KEYS, count_incidents, high_risk_learners, top_counts
+from charts import bar_chart, pie_chart, render_charts
+from html_reports import generate_html_report, generate_learner_html_report
+
+# Report periods offered in "Genereer Leerder Verslag"
+REPORT_PERIODS = ['Daagliks', 'Weekliks', 'Maandelik', 'Kwartaalliks']
+
+# First and last day of the period that contains the given day
+def period_range(period, day):
+    if period == 'Daagliks':
+        start_date = day
+        end_date = day
+    elif period == 'Weekliks':
+        start_date = day - timedelta(days=day.weekday())
+        end_date = start_date + timedelta(days=6)
+    elif period == 'Maandelik':
+        start_date = day.replace(day=1)
+        end_date = (start_date + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+    else:
+        quarter_start_month = ((day.month - 1) // 3) * 3 + 1
+        start_date = day.replace(month=quarter_start_month, day=1)
+        end_date = (start_date + timedelta(days=92)).replace(day=1) - timedelta(days=1)
+    return start_date, end_date
+
+# First and last day of the most recent period that has already closed
+def previous_period_range(period, day):
+    start_date, _ = period_range(period, day)
+    return period_range(period, start_date - timedelta(days=1))
+
+# Charts of incidents per category, type, teacher and class, drawn from counts so a
+# streamed log (analytics.stream_counts) gets the same charts as one held in memory
+def incident_chart_specs(counts):
+    return [
+        bar_chart(counts['category'], 'Insidente volgens Kategorie', 'Kategorie'),
+        bar_chart(top_counts(counts['incident'], 5), 'Insidente volgens Tipe', 'Insident', rotation=30),
+        bar_chart(top_counts(counts['teacher'], 5), 'Insidente volgens Onderwyser', 'Onderwyser', rotation=30),
+        bar_chart(top_counts(counts['class'], 5), 'Insidente volgens Klas', 'Klas', rotation=30),
+        pie_chart(counts['category'], 'Insident Verspreiding')
+    ]
+
+def add_incident_analysis(doc, counts):
+    doc.add_heading('Insident Analise', level=1)
+    for png in render_charts(incident_chart_specs(counts)):
+        doc.add_picture(io.BytesIO(png), width=Inches(3))
+
+# Generate Word document. `counts` (category, incident, teacher and class counts, e.g.
+# from the shared IncidentCube) saves recounting the log for the charts.
+def generate_word_report(df, counts=None):
+    doc = Document()
+    doc.add_heading('Insident Verslag', 0)
+
+    doc.add_heading('Insident Besonderhede', level=1)
+    columns_to_include = ['Learner_Full_Name', 'Class', 'Teacher', 'Incident', 'Category', 'Comment', 'Date']
+    filtered_df = df[columns_to_include]
+    table = doc.add_table(rows=1, cols=len(columns_to_include))
+    table.style = 'Table Grid'
+    for i, col in enumerate(columns_to_include):
+        table.cell(0, i).text = {
+            'Learner_Full_Name': 'Leerder Naam',
+            'Class': 'Klas',
+            'Teacher': 'Onderwyser',
+            'Incident': 'Insident',
+            'Category': 'Kategorie',
+            'Comment': 'Kommentaar',
+            'Date': 'Datum'
+        }.get(col, col)
+    for _, row in filtered_df.iterrows():
+        cells = table.add_row().cells
+        for i, col in enumerate(columns_to_include):
+            if col == 'Date':
+                cells[i].text = row[col].strftime("%Y-%m-%d")
+            else:
+                cells[i].text = str(row[col])
+
+    if counts is None:
+        counts = count_incidents(df, keys=CHART_KEYS)
+    add_incident_analysis(doc, counts)
+
+    doc.add_heading('Leerders met Herhalende Insidente', level=1)
+    learner_counts = count_incidents(df, keys=['learner'])
+    high_risk_df = df[df['Learner_Full_Name'].isin(high_risk_learners(learner_counts))][columns_to_include]
+
+    if not high_risk_df.empty:
+        table = doc.add_table(rows=1, cols=len(columns_to_include))
+        table.style = 'Table Grid'
+        headers = ['Leerder Naam', 'Klas', 'Onderwyser', 'Insident', 'Kategorie', 'Kommentaar', 'Datum']
+        for i, header in enumerate(headers):
+            table.cell(0, i).text = header
+        for _, row in high_risk_df.iterrows():
+            cells = table.add_row().cells
+            for i, col in enumerate(columns_to_include):
+                if col == 'Date':
+                    cells[i].text = row[col].strftime("%Y-%m-%d")
+                else:
+                    cells[i].text = str(row[col])
+    else:
+        doc.add_paragraph("Geen leerders met herhalende insidente nie.")
+
+    doc_stream = io.BytesIO()
+    doc.save(doc_stream)
+    doc_stream.seek(0)
+    return doc_stream
+
+# Generate learner-specific Word report
+def generate_learner_report(df, learner_full_name, period, start_date, end_date):
+    doc = Document()
+    doc.add_heading(f'Insident Verslag vir {learner_full_name}', 0)
+    doc.add_paragraph(f'Tydperk: {period}')
+    doc.add_paragraph(f'Datum Reeks: {start_date.strftime("%Y-%m-%d")} tot {end_date.strftime("%Y-%m-%d")}')
+
+    doc.add_heading('Insident Besonderhede', level=1)
+    columns_to_include = ['Learner_Full_Name', 'Class', 'Teacher', 'Incident', 'Category', 'Comment', 'Date']
+    filtered_df = df[columns_to_include]
+    table = doc.add_table(rows=1, cols=len(columns_to_include))
+    table.style = 'Table Grid'
+    for i, col in enumerate(columns_to_include):
+        table.cell(0, i).text = {
+            'Learner_Full_Name': 'Leerder Naam',
+            'Class': 'Klas',
+            'Teacher': 'Onderwyser',
+            'Incident': 'Insident',
+            'Category': 'Kategorie',
+            'Comment': 'Kommentaar',
+            'Date': 'Datum'
+        }.get(col, col)
+    for _, row in filtered_df.iterrows():
+        cells = table.add_row().cells
+        for i, col in enumerate(columns_to_include):
+            if col == 'Date':
+                cells[i].text = row[col].strftime("%Y-%m-%d")
+            else:
+                cells[i].text = str(row[col])
+
+    if not df.empty:
+        doc.add_heading('Insident Analise', level=1)
+        category_counts = df['Category'].value_counts().sort_index()
+        png, = render_charts([bar_chart(category_counts, 'Insidente volgens Kategorie', 'Kategorie')])
+        doc.add_picture(io.BytesIO(png), width=Inches(3))
+
+    doc_stream = io.BytesIO()
+    doc.save(doc_stream)
+    doc_stream.seek(0)
+    return doc_stream
+
+# Download formats for the full-log and learner reports
+REPORT_FORMATS = {
+    'Word': {
+        'extension': 'docx',
+        'mime': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        'full': generate_word_report,
+        'learner': generate_learner_report
+    },
+    'HTML': {
+        'extension': 'html',
+        'mime': 'text/html',
+        'full': generate_html_report,
+        'learner': generate_learner_html_report
+    }
+}
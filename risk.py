@@ -0,0 +1,94 @@
+import threading
+import numpy as np
+import pandas as pd
+
+# Weight of one incident per category
+CATEGORY_WEIGHTS = {'1': 1.0, '2': 2.0, '3': 4.0, '4': 8.0}
+
+# Rolling windows in days and the weight of an incident that falls inside each.
+# An incident in the last week falls inside all three windows and counts 3 + 2 + 1 times.
+RISK_WINDOWS = [(7, 3.0), (30, 2.0), (90, 1.0)]
+
+# Learners need at least this many incidents in the longest window to be listed
+RISK_MIN_INCIDENTS = 2
+
+# Per-learner risk scores over rolling time windows.
+# Incidents are kept as daily (count, weight) totals bucketed by day, so a query only
+# touches the days inside the longest window, and saves/deletes update it in place.
+class RiskIndex:
+    def __init__(self, incident_log):
+        self._lock = threading.Lock()
+        self._by_day = {}
+        self._classes = {}
+        self.add(incident_log)
+
+    def _apply(self, df, sign):
+        if df.empty:
+            return
+        dates = pd.to_datetime(df['Date'], errors='coerce')
+        valid = dates.notna().to_numpy()
+        days = dates.values.astype('datetime64[D]').astype(np.int64)
+        weights = df['Category'].astype(str).map(CATEGORY_WEIGHTS).fillna(1.0).to_numpy()
+        daily = pd.DataFrame({
+            'Day': days[valid],
+            'Learner': df['Learner_Full_Name'].to_numpy()[valid],
+            'Count': np.ones(valid.sum(), dtype=np.int64),
+            'Weight': weights[valid]
+        }).groupby(['Day', 'Learner'], sort=False).sum()
+        with self._lock:
+            for (day, learner), count, weight in zip(daily.index, daily['Count'], daily['Weight']):
+                bucket = self._by_day.setdefault(int(day), {})
+                old_count, old_weight = bucket.get(learner, (0, 0.0))
+                new_count = old_count + sign * int(count)
+                if new_count > 0:
+                    bucket[learner] = (new_count, old_weight + sign * float(weight))
+                else:
+                    bucket.pop(learner, None)
+                    if not bucket:
+                        del self._by_day[int(day)]
+            if sign > 0:
+                self._classes.update(zip(df['Learner_Full_Name'], df['Class']))
+
+    # Add newly saved incidents
+    def add(self, df):
+        self._apply(df, 1)
+
+    # Remove deleted incidents
+    def remove(self, df):
+        self._apply(df, -1)
+
+    # Highest-scoring learners as of `today`, most at risk first
+    def top(self, n, today):
+        today_number = int(np.datetime64(today, 'D').astype(np.int64))
+        longest = max(days for days, _ in RISK_WINDOWS)
+        learners, ages, counts, weights = [], [], [], []
+        with self._lock:
+            for age in range(longest):
+                bucket = self._by_day.get(today_number - age)
+                if not bucket:
+                    continue
+                for learner, (count, weight) in bucket.items():
+                    learners.append(learner)
+                    ages.append(age)
+                    counts.append(count)
+                    weights.append(weight)
+            classes = dict(self._classes)
+
+        columns = ['Learner_Full_Name', 'Class', 'Risk_Score'] + [f'Incidents_{days}' for days, _ in RISK_WINDOWS]
+        if not learners:
+            return pd.DataFrame(columns=columns)
+
+        codes, names = pd.factorize(np.array(learners, dtype=object))
+        ages = np.array(ages)
+        counts = np.array(counts)
+        weights = np.array(weights)
+        result = pd.DataFrame({'Learner_Full_Name': names})
+        result['Class'] = result['Learner_Full_Name'].map(classes)
+        score = np.zeros(len(names))
+        for days, window_weight in RISK_WINDOWS:
+            inside = ages < days
+            score += window_weight * np.bincount(codes[inside], weights=weights[inside], minlength=len(names))
+            result[f'Incidents_{days}'] = np.bincount(codes[inside], weights=counts[inside], minlength=len(names)).astype(int)
+        result['Risk_Score'] = score.round(1)
+        result = result[result[f'Incidents_{longest}'] >= RISK_MIN_INCIDENTS]
+        return result.nlargest(n, 'Risk_Score')[columns].reset_index(drop=True)
@@ -0,0 +1,47 @@
+import json
+import os
+
+# Default location of the school registry; override with INSIDENT_SCHOOLS to serve other schools
+SCHOOLS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schools.json")
+
+# Settings a school entry may leave out
+SCHOOL_DEFAULTS = {
+    'learner_list': 'learner_list.csv',
+    'incident_log': 'incident_log.csv',
+    'github_repo': None,
+    'github_branch': 'master',
+    'github_path': 'incident_log.csv',
+    'github_token_secret': 'GITHUB_TOKEN',
+    'passcode_secret': None,
+    'artifact_dir': 'artifacts',
+    'sanctions': {}
+}
+
+# File settings that are resolved relative to the registry file
+PATH_KEYS = ['learner_list', 'incident_log', 'artifact_dir']
+
+# Load the school registry: {school_key: settings}
+def load_schools(path=None):
+    path = path or os.environ.get("INSIDENT_SCHOOLS", SCHOOLS_FILE)
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    schools = {}
+    for key, settings in raw.items():
+        school = dict(SCHOOL_DEFAULTS)
+        school.update(settings)
+        school['key'] = key
+        school.setdefault('name', key)
+        for path_key in PATH_KEYS:
+            school[path_key] = os.path.join(base_dir, school[path_key])
+        schools[key] = school
+    if not schools:
+        raise ValueError(f"Geen skole in {path} nie.")
+    return schools
+
+# Look up the sanction for a learner's count in one category, or None below the threshold
+def sanction_for(school, category, count):
+    rule = school['sanctions'].get(category)
+    if rule is None or count <= rule['more_than']:
+        return None
+    return rule['sanction']
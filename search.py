@@ -0,0 +1,97 @@
+import bisect
+import re
+import threading
+import unicodedata
+import pandas as pd
+
+# Frequent Afrikaans and English words that are left out of the index
+STOP_WORDS = frozenset("""
+aan al alle as by daar dan dat die dit een ek en het hom hulle hy in is jy maar met my n na nie of om ons op oor se sal sy te tot van vir was wat wie word
+a an and are as at be but by for from had has have he her him his i in is it its me my not of on or our she so that the their them they this to was we were with you
+""".split())
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+# Lower-case, fold accents (ê -> e, ë -> e) and drop apostrophes so "doesn’t"/"doesnt" and "'n"/"n" match
+def _fold(text):
+    text = unicodedata.normalize("NFKD", str(text).lower().replace("’", "'"))
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN_RE.findall(_fold(text)):
+        token = token.replace("'", "")
+        if len(token) > 1 and token not in STOP_WORDS:
+            tokens.append(token)
+    return tokens
+
+# Inverted index over incident comments keyed by Incident_ID.
+# Queries match all words; a word ending in * matches every indexed word with that prefix.
+class CommentIndex:
+    def __init__(self, incident_log):
+        self._lock = threading.Lock()
+        self._postings = {}
+        self._doc_terms = {}
+        self._doc_dates = {}
+        self._vocabulary = []
+        self.add(incident_log)
+
+    # Index newly saved incidents
+    def add(self, df):
+        dates = pd.to_datetime(df['Date'], errors='coerce')
+        with self._lock:
+            for incident_id, comment, date in zip(df['Incident_ID'], df['Comment'], dates):
+                terms = set(tokenize(comment)) if isinstance(comment, str) else set()
+                self._doc_terms[incident_id] = terms
+                self._doc_dates[incident_id] = date if pd.notna(date) else pd.Timestamp.min
+                for term in terms:
+                    if term not in self._postings:
+                        self._postings[term] = set()
+                        bisect.insort(self._vocabulary, term)
+                    self._postings[term].add(incident_id)
+
+    # Drop deleted incidents
+    def remove(self, df):
+        with self._lock:
+            for incident_id in df['Incident_ID']:
+                for term in self._doc_terms.pop(incident_id, ()):
+                    postings = self._postings[term]
+                    postings.discard(incident_id)
+                    if not postings:
+                        del self._postings[term]
+                        del self._vocabulary[bisect.bisect_left(self._vocabulary, term)]
+                self._doc_dates.pop(incident_id, None)
+
+    def _matches(self, word):
+        if not word.endswith("*"):
+            return self._postings.get(word, set())
+        prefix = word[:-1]
+        matches = set()
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        for term in self._vocabulary[start:]:
+            if not term.startswith(prefix):
+                break
+            matches |= self._postings[term]
+        return matches
+
+    # Return (total matches, Incident_IDs on the requested page), newest first
+    def search(self, query, offset=0, limit=10):
+        words = []
+        for raw in _fold(query).split():
+            if raw.endswith("*"):
+                # Stop words and single letters are only dropped as exact words: "in*" finds "instruksie"
+                tokens = [token.replace("'", "") for token in TOKEN_RE.findall(raw)]
+                words.extend(token + "*" for token in tokens if token)
+            else:
+                words.extend(tokenize(raw))
+        if not words:
+            return 0, []
+        with self._lock:
+            result = None
+            for word in sorted(words, key=lambda w: w.endswith("*")):
+                matches = self._matches(word)
+                result = set(matches) if result is None else result & matches
+                if not result:
+                    return 0, []
+            ranked = sorted(result, key=lambda incident_id: self._doc_dates[incident_id], reverse=True)
+        return len(ranked), ranked[offset:offset + limit]
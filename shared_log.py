@@ -0,0 +1,112 @@
+import threading
+import pandas as pd
+from incidents import (event_rows_frame, log_lock, log_version, normalize_incident_log, read_events_since,
+                       read_incident_log, sanction_mask)
+
+# One in-memory copy of a school's incident log, shared by every session in the process.
+# Readers get the current snapshot and must not modify it: every change builds a new
+# DataFrame (copy-on-write) and bumps `seq`, so a snapshot a session is still rendering
+# never changes underneath it. Listeners are told about every change so derived
+# indexes can follow it incrementally.
+#
+# Several processes (app replicas, ingest.py) can share one log directory: log_lock lets
+# one of them write at a time, and the append-only event stream is how the others hear
+# about it. Each SharedLog remembers how far into the stream it has read and applies
+# only the events after that as deltas. It re-reads the log (snapshot plus replay) only
+# after a compaction or for undo events.
+class SharedLog:
+    def __init__(self, path):
+        self.path = path
+        self.seq = 0
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._version = None
+        self._events_offset = 0
+        self._snapshot = None
+        with self._lock:
+            self._reload()
+
+    def _publish(self, change):
+        self.seq += 1
+        for listener in self._listeners:
+            listener(change)
+
+    # Read the log under the writer lock, so the version and event offset match what was read
+    def _reload(self):
+        with log_lock(self.path):
+            self._version = log_version(self.path)
+            self._snapshot = read_incident_log(self.path)
+            self._events_offset = self._version[1][1] if self._version and self._version[1] else 0
+        self._publish({'reloaded': True, 'log': self._snapshot})
+
+    # Build the next snapshot from a delta and tell the listeners
+    def _change(self, added=None, removed=None, resolved=None):
+        incident_log = self._snapshot
+        if added is not None:
+            incident_log = pd.concat([incident_log, added], ignore_index=True)
+        if removed is not None:
+            incident_log = incident_log[~incident_log['Incident_ID'].isin(removed['Incident_ID'])].reset_index(drop=True)
+        if resolved is not None:
+            incident_log = incident_log.copy()
+            incident_log.loc[sanction_mask(incident_log, resolved), 'Sanction_Resolved'] = True
+        self._snapshot = incident_log
+        self._publish({'reloaded': False, 'log': incident_log, 'added': added, 'removed': removed,
+                       'resolved': resolved})
+
+    # Catch up with writes by other processes: apply their new events, or re-read the log
+    # if it was compacted (the snapshot file changed) or an event cannot be applied as a delta
+    def _catch_up(self):
+        version = log_version(self.path)
+        if version == self._version:
+            return
+        if not self._version or not version or version[0] != self._version[0]:
+            self._reload()
+            return
+        events, offset = read_events_since(self.path, self._events_offset)
+        if any(event['event'] not in ('created', 'deleted', 'resolved') for event in events):
+            self._reload()
+            return
+        for event in events:
+            if event['event'] == 'created':
+                self._change(added=event_rows_frame(event['rows']))
+            elif event['event'] == 'deleted':
+                ids = [row['Incident_ID'] for row in event['rows']]
+                self._change(removed=self._snapshot[self._snapshot['Incident_ID'].isin(ids)])
+            else:
+                # Events recorded before batch resolving name one sanction as learner and category
+                sanctions = event.get('sanctions') or [(event['learner'], event['category'])]
+                self._change(resolved=[tuple(sanction) for sanction in sanctions])
+        self._version, self._events_offset = version, offset
+
+    # Current snapshot, caught up with writes by other processes
+    def snapshot(self):
+        with self._lock:
+            self._catch_up()
+            return self._snapshot
+
+    # Call `listener(change)` on every change, starting with the current snapshot.
+    # A change is {'reloaded': True, 'log': df} or the added/removed/resolved delta of a write;
+    # `resolved` is a list of (learner, category) sanctions.
+    def subscribe(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+            listener({'reloaded': True, 'log': self._snapshot})
+
+    # Fold this process's own write into the snapshot without reading the file back.
+    # If another process wrote in between, catch up from the event stream instead, which
+    # brings in this write too.
+    def apply(self, write, added=None, removed=None, resolved=None):
+        before, after = write
+        with self._lock:
+            if self._version != before:
+                self._catch_up()
+                return self._snapshot
+            if before is None or after[0] != before[0]:
+                # This write compacted the log
+                self._reload()
+                return self._snapshot
+            if added is not None:
+                added = normalize_incident_log(added.copy())
+            self._change(added, removed, resolved)
+            self._version, self._events_offset = after, after[1][1]
+            return self._snapshot
@@ -0,0 +1,105 @@
+import bisect
+import threading
+import numpy as np
+import pandas as pd
+
+# Groups watched for spikes and their Afrikaans labels
+SPIKE_GROUPS = {'Class': 'Klas', 'Teacher': 'Onderwyser'}
+
+# School days (days on which the school logged any incident) that make up the baseline
+SPIKE_LOOKBACK = 40
+
+# Smoothing of the baseline: an EWMA over daily counts with this span in school days
+SPIKE_SPAN = 10
+
+# A day is a spike when it has at least SPIKE_MIN_COUNT incidents and lies more than
+# SPIKE_SIGMAS deviations above the baseline. The deviation is at least sqrt(baseline)
+# and at least 1, so a class that is usually quiet needs a real jump to be flagged.
+SPIKE_SIGMAS = 3.0
+SPIKE_MIN_COUNT = 3
+
+# Daily incident counts per class and per teacher, with EWMA baselines for spike flags.
+# Counts are bucketed by day like RiskIndex, so saves and deletes update them in place
+# and a query only touches the last SPIKE_LOOKBACK school days, however long the log is.
+class SpikeIndex:
+    def __init__(self, incident_log):
+        self._lock = threading.Lock()
+        self._by_day = {}
+        self._days = []  # keys of _by_day, sorted
+        self.add(incident_log)
+
+    def _apply(self, df, sign):
+        if df.empty:
+            return
+        dates = pd.to_datetime(df['Date'], errors='coerce')
+        valid = dates.notna().to_numpy()
+        days = dates.values.astype('datetime64[D]').astype(np.int64)[valid]
+        with self._lock:
+            for group in SPIKE_GROUPS:
+                daily = pd.Series(1, index=pd.MultiIndex.from_arrays(
+                    [days, df[group].to_numpy()[valid]])).groupby(level=[0, 1]).sum()
+                for (day, value), count in daily.items():
+                    if int(day) not in self._by_day:
+                        self._by_day[int(day)] = {}
+                        bisect.insort(self._days, int(day))
+                    bucket = self._by_day[int(day)]
+                    new_count = bucket.get((group, value), 0) + sign * int(count)
+                    if new_count > 0:
+                        bucket[(group, value)] = new_count
+                    else:
+                        bucket.pop((group, value), None)
+                        if not bucket:
+                            del self._by_day[int(day)]
+                            del self._days[bisect.bisect_left(self._days, int(day))]
+
+    # Add newly saved incidents
+    def add(self, df):
+        self._apply(df, 1)
+
+    # Remove deleted incidents
+    def remove(self, df):
+        self._apply(df, -1)
+
+    # Classes and teachers whose incident count on `today` is a spike against their
+    # baseline over the preceding school days, largest jump first
+    def flags(self, today):
+        today_number = int(np.datetime64(today, 'D').astype(np.int64))
+        columns = ['Group', 'Value', 'Count', 'Baseline', 'Ratio']
+        with self._lock:
+            today_bucket = dict(self._by_day.get(today_number, {}))
+            end = bisect.bisect_left(self._days, today_number)
+            past = [dict(self._by_day[day]) for day in self._days[max(0, end - SPIKE_LOOKBACK):end]]
+        if not today_bucket:
+            return pd.DataFrame(columns=columns)
+
+        # One row per class/teacher seen today, one column per school day (oldest first)
+        keys = list(today_bucket)
+        rows = {key: i for i, key in enumerate(keys)}
+        history = np.zeros((len(keys), len(past)))
+        for column, bucket in enumerate(past):
+            for key, count in bucket.items():
+                if key in rows:
+                    history[rows[key], column] = count
+
+        # EWMA mean and variance, vectorized across groups and stepped over the days
+        alpha = 2.0 / (SPIKE_SPAN + 1)
+        mean = np.zeros(len(keys))
+        variance = np.zeros(len(keys))
+        for column in range(history.shape[1]):
+            delta = history[:, column] - mean
+            mean += alpha * delta
+            variance = (1 - alpha) * (variance + alpha * delta ** 2)
+
+        counts = np.array([today_bucket[key] for key in keys], dtype=float)
+        deviation = np.sqrt(np.maximum.reduce([variance, mean, np.ones(len(keys))]))
+        spike = (counts >= SPIKE_MIN_COUNT) & (counts > mean + SPIKE_SIGMAS * deviation)
+        if not spike.any():
+            return pd.DataFrame(columns=columns)
+        result = pd.DataFrame({
+            'Group': [SPIKE_GROUPS[keys[i][0]] for i in np.flatnonzero(spike)],
+            'Value': [keys[i][1] for i in np.flatnonzero(spike)],
+            'Count': counts[spike].astype(int),
+            'Baseline': mean[spike].round(1),
+            'Ratio': (counts[spike] / np.maximum(mean[spike], 1 / SPIKE_SPAN)).round(1)
+        })
+        return result.sort_values(['Ratio', 'Count'], ascending=False, kind='stable').reset_index(drop=True)[columns]
@@ -0,0 +1,67 @@
+import hashlib
+import os
+from functools import lru_cache
+from github import Github
+from incidents import audit_path, events_path, file_lock
+
+def log_error(message):
+    with open("error_log.txt", "a") as f:
+        f.write(f"{message}\n")
+
+# GitHub repository handle, shared by every caller in the process using the same token
+@lru_cache(maxsize=None)
+def get_github_repo(token, repo_name):
+    return Github(token).get_repo(repo_name)
+
+# Git's blob hash of `content`, as GitHub reports it for a file's sha
+def blob_sha(content):
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+# Create or update one file; a file whose content is already in the repository is left alone
+def push_file(repo, school, local_path, repo_path, message):
+    content = b""
+    if os.path.exists(local_path):
+        with open(local_path, "rb") as file:
+            content = file.read()
+    try:
+        contents = repo.get_contents(repo_path, ref=school['github_branch'])
+    except Exception:
+        repo.create_file(
+            path=repo_path,
+            message=f"Created {repo_path} {message}",
+            content=content,
+            branch=school['github_branch']
+        )
+        return
+    if contents.sha == blob_sha(content):
+        return
+    repo.update_file(
+        path=repo_path,
+        message=f"Updated {repo_path} {message}",
+        content=content,
+        sha=contents.sha,
+        branch=school['github_branch']
+    )
+
+# Push a school's incident log to its GitHub repository; failures are logged, not raised.
+# Between compactions only the event stream changes, so a push is a one-line diff of it;
+# the snapshot CSV and the audit trail are only pushed again after a compaction. Pushes
+# from app replicas sharing the log take turns, so they do not race on the files' shas.
+def push_incident_log(token, school, message):
+    with file_lock(f"{school['incident_log']}.sync.lock"):
+        _push_incident_log(token, school, message)
+
+def _push_incident_log(token, school, message):
+    try:
+        repo = get_github_repo(token, school['github_repo'])
+        repo_path = school['github_path']
+        # The audit trail first, so folded events are kept in the repository before they
+        # leave the event stream. Then the events: after a compaction the repository
+        # briefly lacks the folded events, rather than replaying them a second time over
+        # the new snapshot.
+        if os.path.exists(audit_path(school['incident_log'])):
+            push_file(repo, school, audit_path(school['incident_log']), audit_path(repo_path), message)
+        push_file(repo, school, events_path(school['incident_log']), events_path(repo_path), message)
+        push_file(repo, school, school['incident_log'], repo_path, message)
+    except Exception as e:
+        log_error(f"GitHub push failed ({school['key']}): {str(e)}")
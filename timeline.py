@@ -0,0 +1,73 @@
+import bisect
+import threading
+from datetime import date
+import pandas as pd
+
+# Per-learner incident timelines keyed by Incident_ID.
+# Each learner's entries are kept sorted by (day, arrival), so a date range for one
+# learner is two binary searches instead of a scan of the whole log.
+class LearnerIndex:
+    def __init__(self, incident_log):
+        self._lock = threading.Lock()
+        self._columns = list(incident_log.columns)
+        self._timelines = {}
+        self._entries = {}
+        self._rows = {}
+        self._seq = 0
+        self.add(incident_log)
+
+    # Add newly saved incidents; rows without a date sort before every dated row
+    def add(self, df):
+        records = df.to_dict('records')
+        with self._lock:
+            for row in records:
+                day = row['Date'].toordinal() if isinstance(row['Date'], date) and not pd.isna(row['Date']) else 0
+                entry = (day, self._seq, row['Incident_ID'])
+                self._seq += 1
+                bisect.insort(self._timelines.setdefault(row['Learner_Full_Name'], []), entry)
+                self._entries[row['Incident_ID']] = (row['Learner_Full_Name'], entry)
+                self._rows[row['Incident_ID']] = row
+
+    # Drop deleted incidents
+    def remove(self, df):
+        with self._lock:
+            for incident_id in df['Incident_ID']:
+                if incident_id not in self._entries:
+                    continue
+                learner, entry = self._entries.pop(incident_id)
+                del self._rows[incident_id]
+                timeline = self._timelines[learner]
+                del timeline[bisect.bisect_left(timeline, entry)]
+                if not timeline:
+                    del self._timelines[learner]
+
+    # Mirror incidents.mark_sanctions_resolved for one learner and category
+    def resolve(self, learner, category):
+        with self._lock:
+            for _, _, incident_id in self._timelines.get(learner, ()):
+                row = self._rows[incident_id]
+                if row['Category'] == category:
+                    row['Sanction_Resolved'] = True
+
+    def learners(self):
+        with self._lock:
+            return sorted(self._timelines)
+
+    # Incident_IDs of a learner between two dates (inclusive), oldest first.
+    # Without dates the whole timeline is returned, undated rows included.
+    def incident_ids(self, learner, start_date=None, end_date=None):
+        with self._lock:
+            timeline = self._timelines.get(learner, [])
+            if start_date is None and end_date is None:
+                lo = 0
+            else:
+                lo = bisect.bisect_left(timeline, (start_date.toordinal() if start_date is not None else 1,))
+            hi = len(timeline) if end_date is None else bisect.bisect_left(timeline, (end_date.toordinal() + 1,))
+            return [incident_id for _, _, incident_id in timeline[lo:hi]]
+
+    # Rows of a learner between two dates, oldest first, with the log's columns
+    def incidents(self, learner, start_date=None, end_date=None):
+        ids = self.incident_ids(learner, start_date, end_date)
+        with self._lock:
+            rows = [dict(self._rows[incident_id]) for incident_id in ids if incident_id in self._rows]
+        return pd.DataFrame(rows, columns=self._columns)